@@ -1,9 +1,10 @@
+import errno
+import functools
 import os
-import re
 import shutil
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from . import confirmation, english, exceptions, globreplace
 from .common import AbsolutePath, PathLike, abspath
@@ -18,7 +19,7 @@ from .db import (
     InvocationOp,
     OpType,
 )
-from .fileset import FileSet, FilterSet
+from .fileset import FilterSet
 
 
 @dataclass
@@ -49,12 +50,20 @@ class BatchOp:
     # this is BatchOp's bookkeeping directory
     directory: AbsolutePath
     db: Database
+    # max number of threads to use for file-system operations
+    threads: int
 
     def __init__(
-        self, root: Optional[PathLike] = None, context: str = INVOCATION_CONTEXT_PYTHON
+        self,
+        root: Optional[PathLike] = None,
+        context: str = INVOCATION_CONTEXT_PYTHON,
+        *,
+        threads: int = 1,
     ) -> None:
+        self.threads = threads
         if root is None:
-            self.root = abspath(Path.cwd())
+            # already absolute, so no need to go through `abspath`
+            self.root = AbsolutePath(Path.cwd())
         else:
             self.root = abspath(root)
 
@@ -66,8 +75,7 @@ class BatchOp:
         self.backup_dir().mkdir(exist_ok=True)
 
     def count(self, filterset: FilterSet) -> int:
-        fileset = filterset.resolve(self.root, recursive=False)
-        return len(fileset)
+        return filterset.count(self.root, recursive=False, threads=self.threads)
 
     def delete(
         self,
@@ -77,7 +85,14 @@ class BatchOp:
         dry_run: bool = False,
         original_cmdline: str = "",
     ) -> Optional[DeleteResult]:
-        fileset = filterset.resolve(self.root, recursive=True)
+        # Only the roots are deleted, so the rest of the file set is only needed to show the user
+        # what will be deleted.
+        fileset = filterset.resolve(
+            self.root,
+            recursive=True,
+            threads=self.threads,
+            roots_only=not require_confirm,
+        )
         if fileset.is_empty():
             raise exceptions.EmptyFileSet
 
@@ -89,16 +104,36 @@ class BatchOp:
         if dry_run:
             paths_deleted = list(fileset.exclude_children())
         else:
+            roots = [item for item in fileset.items if item.is_root]
+            if len(roots) > _SORT_BY_INODE_THRESHOLD:
+                # Visiting entries in inode order within each directory keeps the file system's inode
+                # table and directory blocks warm in the cache. `_move_many` groups by parent directory
+                # in insertion order, so the sort is preserved.
+                roots.sort(key=lambda item: (os.path.dirname(item.path), item.inode))
+
             undo_mgr = UndoManager.start(self.db, self.backup_dir(), original_cmdline)
-            for p in fileset.exclude_children():
-                new_path = undo_mgr.add_op(OP_TYPE_DELETE, p)
-                shutil.move(p, new_path)
-                paths_deleted.append(p)
+            pairs: List[Tuple[Path, Path]] = []
+            # bound methods are looked up once since this loop runs once per file
+            add_op = undo_mgr.add_op
+            append_pair = pairs.append
+            append_path = paths_deleted.append
+            for item in roots:
+                path = item.path
+                append_pair((path, add_op(OP_TYPE_DELETE, path)))
+                append_path(path)
+
+            undo_mgr.flush()
+            self._move_or_roll_back(undo_mgr, pairs)
 
         return DeleteResult(paths_deleted)
 
-    def list(self, filterset: FilterSet) -> List[AbsolutePath]:
-        return list(filterset.resolve(self.root, recursive=False))
+    def list(self, filterset: FilterSet) -> Iterator[AbsolutePath]:
+        return (
+            item.path
+            for item in filterset.iterate(
+                self.root, recursive=False, threads=self.threads
+            )
+        )
 
     def move(
         self,
@@ -113,7 +148,7 @@ class BatchOp:
         if destination.exists() and not destination.is_dir():
             raise exceptions.NotADirectory(destination)
 
-        fileset = filterset.resolve(self.root, recursive=True)
+        fileset = filterset.resolve(self.root, recursive=True, threads=self.threads)
         if fileset.is_empty():
             raise exceptions.EmptyFileSet
 
@@ -121,21 +156,40 @@ class BatchOp:
             if not confirmation.confirm_operation_on_fileset(fileset, "Move"):
                 return None
 
-        _detect_duplicates(fileset)
+        # name --> path, to catch two paths that would be moved to the same place
+        seen: Dict[str, Path] = {}
+        paths_moved = []
+        pairs: List[Tuple[Path, Path]] = []
+        for p in fileset:
+            name = p.name
+            other = seen.get(name)
+            if other is not None:
+                raise exceptions.PathCollision(path1=p, path2=other)
+            seen[name] = p
+
+            paths_moved.append(p)
+            pairs.append((p, destination / name))
+
+        _detect_existing(pairs)
 
-        paths_moved = list(fileset)
         if not dry_run:
             undo_mgr = UndoManager.start(self.db, self.backup_dir(), original_cmdline)
+            undo_mgr.add_op(OP_TYPE_CREATE, None, destination)
+            add_op = undo_mgr.add_op
+            for src, dst in pairs:
+                add_op(OP_TYPE_MOVE, src, dst)
+            undo_mgr.flush()
+
             # TODO: add to confirmation message if destination will be created
             # it is important to do this AFTER calling `fileset.resolve()` as otherwise the destination directory could
             # be picked up as a source
-            undo_mgr.add_op(OP_TYPE_CREATE, None, destination)
-            destination.mkdir(parents=False, exist_ok=True)
+            try:
+                destination.mkdir(parents=False)
+                created_dir: Optional[Path] = destination
+            except FileExistsError:
+                created_dir = None
 
-            for p in paths_moved:
-                undo_mgr.add_op(OP_TYPE_MOVE, p, destination / p.name)
-                # TODO: do in batches?
-                shutil.move(p, destination)
+            self._move_or_roll_back(undo_mgr, pairs, created_dir=created_dir)
 
         return MoveResult(paths_moved, destination)
 
@@ -150,15 +204,18 @@ class BatchOp:
         original_cmdline: str = "",
     ) -> Optional[RenameResult]:
         if filterset_opt is None:
-            # TODO: FilterSet() is inefficient, should constrain based on `old` pattern
             filterset = FilterSet()
         else:
             filterset = filterset_opt
 
-        pattern = re.compile(globreplace.glob_to_regex(old))
-        repl = globreplace.glob_to_regex_repl(new)
+        # Names that can't match `old` are then skipped by the walk itself. `?` and `[` are only
+        # special to fnmatch, so patterns containing them are left to `rename_one`.
+        if not any(c in old for c in "?[/"):
+            filterset = filterset.is_like(old)
+
+        rename_one = globreplace.compile_renamer(old, new)
 
-        fileset = filterset.resolve(self.root, recursive=False)
+        fileset = filterset.resolve(self.root, recursive=False, threads=self.threads)
         if fileset.is_empty():
             raise exceptions.EmptyFileSet
 
@@ -166,30 +223,64 @@ class BatchOp:
             if not confirmation.confirm_operation_on_fileset(fileset, "Rename"):
                 return None
 
+        # new path --> old path
+        seen: Dict[Path, Path] = {}
         paths_renamed: Dict[AbsolutePath, str] = {}
+        pairs: List[Tuple[Path, Path]] = []
         for p in fileset:
-            new_name = pattern.sub(repl, p.name)
-            if new_name == p.name:
+            name = p.name
+            new_name = rename_one(name)
+            if new_name is None or new_name == name:
                 continue
 
+            new_path = p.parent / new_name
+            other = seen.get(new_path)
+            if other is not None:
+                raise exceptions.PathCollision(path1=p, path2=other)
+            seen[new_path] = p
+
             paths_renamed[p] = new_name
+            pairs.append((p, new_path))
 
-        _detect_name_collisions(paths_renamed)
+        _detect_existing(pairs)
 
         if not dry_run:
-            # TODO: detect name collisions before starting
             undo_mgr = UndoManager.start(self.db, self.backup_dir(), original_cmdline)
-            for p, new_name in paths_renamed.items():
-                new_path = p.parent / new_name
-                undo_mgr.add_op(OP_TYPE_RENAME, p, new_path)
-                # TODO: don't overwrite existing
-                shutil.move(p, new_path)
+            add_op = undo_mgr.add_op
+            for src, dst in pairs:
+                add_op(OP_TYPE_RENAME, src, dst)
+            undo_mgr.flush()
+
+            self._move_or_roll_back(undo_mgr, pairs)
 
         return RenameResult(paths_renamed)
 
+    # If any move fails, the ones that already succeeded are moved back and the invocation is
+    # forgotten, so a failed command leaves the file system as it found it rather than half-done.
+    def _move_or_roll_back(
+        self,
+        undo_mgr: "UndoManager",
+        pairs: List[Tuple[Path, Path]],
+        *,
+        created_dir: Optional[Path] = None,
+    ) -> None:
+        done: List[MovedGroup] = []
+        try:
+            _move_many(pairs, threads=self.threads, done=done)
+        except BaseException:
+            # if this fails, the invocation is kept so that `undo` can finish the job
+            _roll_back_moves(done)
+            if created_dir is not None:
+                created_dir.rmdir()
+            _remove_invocation_backup_dir(
+                undo_mgr.backup_directory, undo_mgr.invocation_id
+            )
+            self.db.delete_invocation(undo_mgr.invocation_id)
+            raise
+
     # TODO: should this take an explicit undo ID?
     def undo(self, *, require_confirm: bool = True) -> Optional[UndoResult]:
-        invocation, invocation_ops = self.db.get_last_invocation()
+        invocation = self.db.get_last_invocation()
 
         if invocation is None:
             raise exceptions.Base("there is no previous command to undo")
@@ -204,13 +295,14 @@ class BatchOp:
                 raise exceptions.Base(f"{the_last_command} was not undo-able")
             else:
                 raise exceptions.Base("the last command was not undo-able")
-        if len(invocation_ops) == 0:
+        num_ops = self.db.count_invocation_ops(invocation.invocation_id)
+        if num_ops == 0:
             # TODO: is this case ever possible?
             raise exceptions.Base(
                 f"{the_last_command} did not do anything so there is nothing to undo"
             )
 
-        prompt = english.confirm_undo(invocation, invocation_ops)
+        prompt = english.confirm_undo(invocation, num_ops)
         if require_confirm and not confirmation.confirm(prompt):
             return None
 
@@ -223,9 +315,9 @@ class BatchOp:
         # If we undo create A before we undo the move, we deleted A/b.txt and now we can't restore it!
         #
         # In reality `_undo_create` will refuse to delete a non-empty directory. Still, the principle is important.
-        _sort_undo_ops(invocation_ops)
-
-        for op in invocation_ops:
+        #
+        # `get_last_invocation` returns the ops with creates last, so no sorting is needed here.
+        for op in self.db.iterate_invocation_ops(invocation.invocation_id):
             if op.op_type == OP_TYPE_DELETE:
                 self._undo_delete(op)
             elif op.op_type == OP_TYPE_RENAME or op.op_type == OP_TYPE_MOVE:
@@ -235,32 +327,31 @@ class BatchOp:
             else:
                 raise exceptions.Impossible
 
+        _remove_invocation_backup_dir(self.backup_dir(), invocation.invocation_id)
         self.db.delete_invocation(invocation.invocation_id)
-        return UndoResult(
-            original_cmdline=invocation.cmdline, num_ops=len(invocation_ops)
-        )
+        return UndoResult(original_cmdline=invocation.cmdline, num_ops=num_ops)
 
     def _undo_delete(self, op: InvocationOp) -> None:
-        if op.path_after.exists():
-            # TODO: check for collision?
-            shutil.move(op.path_after, op.path_before)
+        # TODO: check for collision?
+        _move_back(op)
 
         # TODO: what to do if path_after doesn't exist?
         # could be innocuous, e.g. previous 'undo' command failed midway but some paths were already
         # restored
 
     def _undo_rename_or_move(self, op: InvocationOp) -> None:
-        if op.path_after.exists():
-            # TODO: check for collision?
-            shutil.move(op.path_after, op.path_before)
+        # TODO: check for collision?
+        _move_back(op)
 
     def _undo_create(self, op: InvocationOp) -> None:
-        if op.path_after.exists():
-            if op.path_after.is_dir():
-                op.path_after.rmdir()
-            else:
-                op.path_after.unlink()
-        # TODO: what to do if path_after doesn't exist?
+        # try first instead of checking first, to save a `stat` call
+        try:
+            os.rmdir(op.path_after)
+        except FileNotFoundError:
+            # TODO: what to do if path_after doesn't exist?
+            pass
+        except NotADirectoryError:
+            os.unlink(op.path_after)
 
     def backup_dir(self) -> AbsolutePath:
         return self.directory / "backup"
@@ -276,18 +367,39 @@ class BatchOp:
         if env_xdg_data_home is not None:
             return AbsolutePath(Path(env_xdg_data_home).absolute() / "batchop")
 
-        local_share = Path.home() / ".local" / "share"
-        if local_share.exists() and local_share.is_dir():
-            return AbsolutePath(local_share / "batchop")
+        return _default_directory(os.environ.get("HOME"))
+
+
+# Only the fallback under the home directory is cached, since it costs a `Path.home()` lookup and
+# `stat` calls on every call; `Path.home()` reads `HOME` if it is set, so that is the cache key.
+@functools.lru_cache(maxsize=None)
+def _default_directory(env_home: Optional[str]) -> AbsolutePath:
+    local_share = Path.home() / ".local" / "share"
+    if local_share.exists() and local_share.is_dir():
+        return AbsolutePath(local_share / "batchop")
 
-        return AbsolutePath(Path.home().absolute() / ".batchop")
+    return AbsolutePath(Path.home().absolute() / ".batchop")
+
+
+# below this, sorting costs more than it could save
+_SORT_BY_INODE_THRESHOLD = 256
+# below this many moves, starting a thread pool costs more than it saves
+_THREADS_THRESHOLD = 64
+# write pending undo ops in batches of this size, so huge operations don't hold them all in memory
+_UNDO_FLUSH_THRESHOLD = 5000
+# maximum number of backups in each subdirectory of an invocation's backup directory
+_BACKUP_SHARD_SIZE = 4096
 
 
 class UndoManager:
     db: Database
     backup_directory: Path
     invocation_id: InvocationId
+    invocation_dir: Path
     i: int
+    _prefix: str
+    # ops that have been added but not yet written to the database
+    pending: List[Tuple[OpType, Optional[Path], Path]]
 
     @classmethod
     def start(cls, db: Database, backup_directory: Path, cmdline: str) -> "UndoManager":
@@ -302,6 +414,16 @@ class UndoManager:
         self.backup_directory = backup_directory
         self.invocation_id = invocation_id
         self.i = 1
+        self.pending = []
+        # Each invocation gets its own backup directory, so that backups don't pile up in one
+        # directory across invocations, and undoing can remove them all at once. Within it, backups
+        # are split into subdirectories of `_BACKUP_SHARD_SIZE` entries each, so that a single huge
+        # delete doesn't leave millions of entries in one directory either.
+        #
+        # Directories are created on first use, since most commands don't delete anything.
+        self.invocation_dir = backup_directory / invocation_id
+        # formatted once here since `_make_new_path` is called for every deleted file
+        self._prefix = os.path.join(self.invocation_dir, "")
 
     def add_op(
         self,
@@ -312,42 +434,176 @@ class UndoManager:
         if path_after is None:
             path_after = self._make_new_path()
 
-        self.db.create_invocation_op(
-            self.invocation_id, op_type, path_before, path_after
-        )
+        self.pending.append((op_type, path_before, path_after))
+        if len(self.pending) >= _UNDO_FLUSH_THRESHOLD:
+            self.flush()
         return path_after
 
-    def _make_new_path(self) -> Path:
-        r = self.backup_directory / f"{self.invocation_id}___{self.i:0>8}"
-        self.i += 1
-        return r
-
-
-def _detect_name_collisions(paths_renamed: Dict[AbsolutePath, str]) -> None:
-    # new path --> old path
-    already_seen: Dict[Path, Path] = {}
-    for old_path, new_name in paths_renamed.items():
-        new_path = old_path.parent / new_name
-        if new_path in already_seen:
-            raise exceptions.PathCollision(path1=old_path, path2=already_seen[new_path])
-
-        already_seen[new_path] = old_path
-
+    # must be called before the file system is touched, so that an interrupted operation can still
+    # be undone
+    def flush(self) -> None:
+        if self.pending:
+            self.db.create_invocation_ops(self.invocation_id, self.pending)
+            self.pending = []
 
-def _detect_duplicates(fileset: FileSet) -> None:
-    already_seen: Dict[str, Path] = {}
-    for path in fileset:
-        other = already_seen.get(path.name)
-        if other is not None:
-            raise exceptions.PathCollision(path1=path, path2=other)
-        already_seen[path.name] = path
-
-
-def _sort_undo_ops(ops: List[InvocationOp]) -> None:
-    def _key(op: InvocationOp) -> int:
-        if op.op_type == OP_TYPE_CREATE:
-            return 2
-        else:
-            return 1
+    def _make_new_path(self) -> Path:
+        i = self.i
+        shard, offset = divmod(i, _BACKUP_SHARD_SIZE)
+        shard_prefix = f"{self._prefix}{shard:04}"
+        if i == 1 or offset == 0:
+            os.makedirs(shard_prefix, exist_ok=True)
 
-    ops.sort(key=_key)
+        self.i += 1
+        return Path(f"{shard_prefix}{os.sep}{i:08}")
+
+
+def _remove_invocation_backup_dir(
+    backup_directory: Path, invocation_id: InvocationId
+) -> None:
+    # Any error means either that the invocation didn't delete anything (or predates per-invocation
+    # directories), or that something is unexpectedly still in the directory, in which case it is
+    # left alone.
+    invocation_dir = backup_directory / invocation_id
+    try:
+        with os.scandir(invocation_dir) as it:
+            shards = [entry.path for entry in it]
+    except OSError:
+        return
+
+    for shard in shards:
+        try:
+            os.rmdir(shard)
+        except OSError:
+            pass
+
+    try:
+        invocation_dir.rmdir()
+    except OSError:
+        pass
+
+
+# Moves `op.path_after` back to `op.path_before`, doing nothing if `op.path_after` doesn't exist.
+def _move_back(op: InvocationOp) -> None:
+    # try first instead of checking first, to save a `stat` call per op
+    try:
+        _move(op.path_after, op.path_before)
+    except FileNotFoundError:
+        # the error could also be because the parent of `path_before` is gone, which is a real error
+        if os.path.lexists(op.path_after):
+            raise
+
+
+def _move(src: PathLike, dst: PathLike) -> None:
+    # `shutil.move` does several extra `stat` calls before it gets around to `os.rename`, so only fall
+    # back to it if the paths are on different file systems (e.g., the backup directory)
+    try:
+        os.rename(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+
+        shutil.move(src, dst)
+
+
+# (source directory, destination directory, [(source name, destination name)], number moved)
+MovedGroup = Tuple[str, str, List[Tuple[str, str]], int]
+
+
+# Every group that was attempted is appended to `done` along with how many of its moves succeeded, so
+# that a failed batch can be rolled back.
+def _move_many(
+    pairs: List[Tuple[Path, Path]], *, threads: int = 1, done: List[MovedGroup]
+) -> None:
+    # Group by parent directory so that each directory is opened once and `renameat` can be passed
+    # bare names, instead of the kernel re-resolving every component of the full path on each call.
+    #
+    # Groups can be moved in parallel, but the kernel locks both parent directories for each rename,
+    # so groups that share a directory serialize on it. `delete` moves everything into the same
+    # backup directory and `move` into the same destination, so threads mostly help when the groups'
+    # directories are all different, as with `rename`.
+    #
+    # Paths are split once into plain strings, since `Path.name` and `Path.parent` are slow compared
+    # to `os.path` and this runs once per file.
+    groups: Dict[Tuple[str, str], List[Tuple[str, str]]] = {}
+    for src, dst in pairs:
+        src_dir, src_name = os.path.split(src)
+        dst_dir, dst_name = os.path.split(dst)
+        groups.setdefault((src_dir, dst_dir), []).append((src_name, dst_name))
+
+    if threads > 1 and len(groups) > 1 and len(pairs) >= _THREADS_THRESHOLD:
+        # imported here since it is slow to import and only needed if threads were requested
+        import concurrent.futures
+
+        # leaving the `with` block waits for every group, so `done` is complete if this raises
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+            futures = [
+                executor.submit(_move_group, src_dir, dst_dir, group, done)
+                for (src_dir, dst_dir), group in groups.items()
+            ]
+            for future in futures:
+                # re-raises the exception if the move failed
+                future.result()
+    else:
+        for (src_dir, dst_dir), group in groups.items():
+            _move_group(src_dir, dst_dir, group, done)
+
+
+# `group` is a list of (source name, destination name) pairs
+def _move_group(
+    src_dir: str,
+    dst_dir: str,
+    group: List[Tuple[str, str]],
+    done: List[MovedGroup],
+) -> None:
+    moved = 0
+    try:
+        if os.rename not in os.supports_dir_fd:
+            join = os.path.join
+            for src_name, dst_name in group:
+                _move(join(src_dir, src_name), join(dst_dir, dst_name))
+                moved += 1
+            return
+
+        fds: Dict[str, int] = {}
+        try:
+            src_fd = _open_dir(fds, src_dir)
+            dst_fd = _open_dir(fds, dst_dir)
+            rename = os.rename
+            for src_name, dst_name in group:
+                try:
+                    rename(src_name, dst_name, src_dir_fd=src_fd, dst_dir_fd=dst_fd)
+                except OSError as e:
+                    if e.errno != errno.EXDEV:
+                        raise
+
+                    shutil.move(
+                        os.path.join(src_dir, src_name), os.path.join(dst_dir, dst_name)
+                    )
+                moved += 1
+        finally:
+            for fd in fds.values():
+                os.close(fd)
+    finally:
+        # `list.append` is atomic, so this is safe from worker threads
+        done.append((src_dir, dst_dir, group, moved))
+
+
+def _roll_back_moves(done: List[MovedGroup]) -> None:
+    for src_dir, dst_dir, group, moved in reversed(done):
+        for src_name, dst_name in reversed(group[:moved]):
+            _move(os.path.join(dst_dir, dst_name), os.path.join(src_dir, src_name))
+
+
+def _open_dir(fds: Dict[str, int], directory: str) -> int:
+    fd = fds.get(directory)
+    if fd is None:
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        fds[directory] = fd
+    return fd
+
+
+def _detect_existing(pairs: List[Tuple[Path, Path]]) -> None:
+    # `os.rename` will silently overwrite an existing file, so check up-front
+    for old_path, new_path in pairs:
+        if os.path.lexists(new_path):
+            raise exceptions.PathCollision(path1=old_path, path2=new_path)
@@ -2,39 +2,37 @@ from typing import Any
 
 
 # https://en.wikipedia.org/wiki/ANSI_escape_code#Colors
-_BLUE = 94
-_RED = 91
-_GREEN = 92
-_RESET = 0
+_BLUE = "\033[94m"
+_RED = "\033[91m"
+_GREEN = "\033[92m"
+_RESET = "\033[0m"
+
+# The escape codes actually emitted, which are all empty when colors are disabled. They are set by
+# `enable` and `disable` rather than checked on every call, since these functions run once per
+# number in the summaries.
+_blue = _BLUE
+_red = _RED
+_green = _GREEN
+_reset = _RESET
 
 
 def number(x: Any) -> str:
-    return _raw(_BLUE) + str(x) + _raw(_RESET)
+    return f"{_blue}{x}{_reset}"
 
 
 def danger(x: Any) -> str:
-    return _raw(_RED) + str(x) + _raw(_RESET)
+    return f"{_red}{x}{_reset}"
 
 
 def code(x: Any) -> str:
-    return _raw(_GREEN) + str(x) + _raw(_RESET)
-
-
-def _raw(code: int) -> str:
-    if not _ENABLED:
-        return ""
-
-    return f"\033[{code}m"
-
-
-_ENABLED = True
+    return f"{_green}{x}{_reset}"
 
 
 def enable() -> None:
-    global _ENABLED
-    _ENABLED = True
+    global _blue, _red, _green, _reset
+    _blue, _red, _green, _reset = _BLUE, _RED, _GREEN, _RESET
 
 
 def disable() -> None:
-    global _ENABLED
-    _ENABLED = False
+    global _blue, _red, _green, _reset
+    _blue = _red = _green = _reset = ""
@@ -1,8 +1,10 @@
+import collections
 import decimal
+import itertools
 import re
 import sys
 from pathlib import Path
-from typing import Any, List, NewType, NoReturn, Optional, Union
+from typing import Any, Iterable, List, NewType, NoReturn, Optional, Union
 
 from . import colors
 
@@ -28,38 +30,46 @@ def abspath(
         return p.absolute()
 
 
+# every accepted spelling of a unit (lowercase) --> its multiple in bytes
+_UNIT_MULTIPLES = {
+    spelling: multiple
+    for multiple, spellings in [
+        (1, ("b", "byte", "bytes")),
+        (1000, ("kb", "kilobyte", "kilobytes")),
+        (1_000_000, ("mb", "megabyte", "megabytes")),
+        (1_000_000_000, ("gb", "gigabyte", "gigabytes")),
+        (1_000_000_000_000, ("tb", "terabyte", "terabytes")),
+    ]
+    for spelling in spellings
+}
+
+
 def unit_to_multiple(unit: str) -> Optional[int]:
-    unit = unit.lower()
-    if unit in ("b", "byte", "bytes"):
-        return 1
-    elif unit in ("kb", "kilobyte", "kilobytes"):
-        return 1000
-    elif unit in ("mb", "megabyte", "megabytes"):
-        return 1_000_000
-    elif unit in ("gb", "gigabyte", "gigabytes"):
-        return 1_000_000_000
-    elif unit in ("tb", "terabyte", "terabytes"):
-        return 1_000_000_000_000
-    else:
-        return None
+    return _UNIT_MULTIPLES.get(unit.lower())
 
 
 def bytes_to_unit(nbytes: int, *, color: bool = True) -> Optional[str]:
     if nbytes < 1000:
         return None
 
-    ndec = decimal.Decimal(nbytes)
     if nbytes < 1_000_000:
-        n = ndec / 1_000
+        divisor = 1_000
         unit = "KB"
     elif nbytes < 1_000_000_000:
-        n = ndec / 1_000_000
+        divisor = 1_000_000
         unit = "MB"
     else:
-        n = ndec / 1_000_000_000
+        divisor = 1_000_000_000
         unit = "GB"
 
-    nr = round(n, 1)
+    # Only one decimal place is shown, so count in tenths of the unit with integer arithmetic instead
+    # of building a `Decimal`. Ties round to even, as `round(Decimal(...), 1)` did.
+    tenth = divisor // 10
+    tenths, remainder = divmod(nbytes, tenth)
+    if remainder * 2 > tenth or (remainder * 2 == tenth and tenths % 2 == 1):
+        tenths += 1
+
+    nr = f"{tenths // 10}.{tenths % 10}"
     if color:
         return f"{colors.number(nr)} {unit}"
     else:
@@ -67,14 +77,39 @@ def bytes_to_unit(nbytes: int, *, color: bool = True) -> Optional[str]:
 
 
 def plural(n: int, s: str, ss: str = "", color: bool = False) -> str:
-    if not ss:
-        ss = s + "s"
-
     n_s = f"{n:,}"
     if color:
         n_s = colors.number(n_s)
 
-    return f"{n_s} {s}" if n == 1 else f"{n_s} {ss}"
+    if n == 1:
+        return f"{n_s} {s}"
+    else:
+        # only build the default plural form if it's actually needed
+        return f"{n_s} {ss or s + 's'}"
+
+
+def ilen(iterable: Iterable[Any]) -> int:
+    # equivalent to `sum(1 for _ in iterable)` but the loop runs in C, and unlike `len(list(...))`
+    # nothing is kept in memory
+    counter = itertools.count()
+    collections.deque(zip(iterable, counter), maxlen=0)
+    return next(counter)
+
+
+# number of lines written to stdout at a time by `print_lines`
+_PRINT_CHUNK_SIZE = 4096
+
+
+# Prints each item on its own line, like calling `print` in a loop but with one `write` per chunk of
+# lines rather than one per line.
+def print_lines(items: Iterable[Any]) -> None:
+    it = iter(items)
+    while True:
+        chunk = [f"{item}\n" for item in itertools.islice(it, _PRINT_CHUNK_SIZE)]
+        if not chunk:
+            break
+
+        sys.stdout.writelines(chunk)
 
 
 def err_and_bail(msg: Any) -> NoReturn:
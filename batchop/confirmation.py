@@ -1,16 +1,21 @@
-import random
 import sys
 
 from . import english, exceptions
+from .common import print_lines
 from .fileset import FileSet
 
+_YES = frozenset(["yes", "y"])
+_NO = frozenset(["no", "n"])
+_HELP = frozenset(["help", "h"])
+_LIST = frozenset(["list", "l", "ls"])
+
 
 def confirm(prompt: str) -> bool:
     while True:
         r = input(prompt).strip().lower()
-        if r == "yes" or r == "y":
+        if r in _YES:
             return True
-        elif r == "no" or r == "n":
+        elif r in _NO:
             return False
         else:
             print("Please enter 'yes' or 'no'.")
@@ -20,9 +25,9 @@ def confirm_operation_on_fileset(fs: FileSet, verb: str) -> bool:
     if fs.is_empty():
         raise exceptions.EmptyFileSet
 
+    # the file set doesn't change while we're asking, so only summarize it once
+    prompt = english.confirm_n_files_generic(verb, fs)
     while True:
-        prompt = english.confirm_n_files_generic(verb, fs)
-
         try:
             response = input(prompt).strip().lower()
         except EOFError:
@@ -31,11 +36,11 @@ def confirm_operation_on_fileset(fs: FileSet, verb: str) -> bool:
             print()
             sys.exit(1)
 
-        if response == "yes" or response == "y":
+        if response in _YES:
             return True
-        elif response == "no" or response == "n":
+        elif response in _NO:
             return False
-        elif response == "help" or response == "h":
+        elif response in _HELP:
             # TODO: redefine command to interactively change fileset
             print("Available commands:")
             print("  yes:           confirm operation")
@@ -43,14 +48,14 @@ def confirm_operation_on_fileset(fs: FileSet, verb: str) -> bool:
             print("  list:          list files")
             print("  random:        list 10 random files")
             print("  help:          print this dialog")
-        elif response in ("list", "l", "ls"):
-            for path in fs:
-                print(path)
+        elif response in _LIST:
+            print_lines(fs)
         elif response == "random":
-            all_paths = list(fs)
-            random.shuffle(all_paths)
-            for path in all_paths[:10]:
-                print(path)
+            import random
+
+            # picks 10 items directly instead of copying and shuffling the whole file set
+            for item in random.sample(fs.items, min(10, len(fs))):
+                print(item.path)
         else:
             print(
                 "Response not understood. Please enter 'yes' or 'no', or 'help' to view available commands."
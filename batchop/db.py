@@ -3,7 +3,7 @@ import time
 import uuid
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, NewType, Optional, Tuple
+from typing import Iterator, List, NewType, Optional, Tuple
 
 
 # TODO: automatically handle migration from old to new version
@@ -99,27 +99,38 @@ class Database:
         )
         return InvocationId(invocation_id)
 
-    def create_invocation_op(
+    # each op is (op_type, path_before, path_after); all are inserted in a single transaction
+    def create_invocation_ops(
         self,
         invocation_id: InvocationId,
-        op_type: OpType,
-        path_before: Optional[Path],
-        path_after: Path,
+        ops: List[Tuple[OpType, Optional[Path], Path]],
     ) -> None:
-        self.conn.execute(
-            f"""
-            INSERT INTO invocation_op({_INVOCATION_OP_FIELDS})
-            VALUES (?, ?, ?, ?)
-            """,
+        rows = (
             (
                 invocation_id,
                 op_type,
                 str(path_before) if path_before is not None else "",
                 str(path_after),
-            ),
+            )
+            for op_type, path_before, path_after in ops
         )
 
-    def get_last_invocation(self) -> Tuple[Optional[Invocation], List[InvocationOp]]:
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.executemany(
+                f"""
+                INSERT INTO invocation_op({_INVOCATION_OP_FIELDS})
+                VALUES (?, ?, ?, ?)
+                """,
+                rows,
+            )
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        else:
+            self.conn.execute("COMMIT")
+
+    def get_last_invocation(self) -> Optional[Invocation]:
         cursor = self.conn.execute(
             f"""
             SELECT {_INVOCATION_FIELDS}
@@ -132,28 +143,40 @@ class Database:
         )
         row = cursor.fetchone()
         if row is None:
-            return None, []
+            return None
+
+        return Invocation(InvocationId(row[0]), row[1], row[2], bool(row[3]), row[4])
 
-        invocation = Invocation(
-            InvocationId(row[0]), row[1], row[2], bool(row[3]), row[4]
+    def count_invocation_ops(self, invocation_id: InvocationId) -> int:
+        cursor = self.conn.execute(
+            """
+            SELECT COUNT(*)
+            FROM invocation_op
+            WHERE invocation_id = ?
+            """,
+            (invocation_id,),
         )
+        return cursor.fetchone()[0]
 
+    # Yields the ops straight from the cursor, so an invocation with millions of ops is never held in
+    # memory all at once.
+    def iterate_invocation_ops(
+        self, invocation_id: InvocationId
+    ) -> Iterator[InvocationOp]:
         cursor = self.conn.execute(
             f"""
             SELECT {_INVOCATION_OP_FIELDS}
             FROM invocation_op
             WHERE invocation_id = ?
+            ORDER BY op_type = ?, rowid
             """,
-            (invocation.invocation_id,),
+            # creates go last, other ops keep the order they were recorded in (see `BatchOp.undo`)
+            (invocation_id, OP_TYPE_CREATE),
         )
-        rows = cursor.fetchall()
-        ops = [
-            InvocationOp(
+        for row in cursor:
+            yield InvocationOp(
                 InvocationId(row[0]), OpType(row[1]), Path(row[2]), Path(row[3])
             )
-            for row in rows
-        ]
-        return invocation, ops
 
     def delete_invocation(self, invocation_id: InvocationId) -> None:
         self.conn.execute(
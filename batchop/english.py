@@ -1,15 +1,14 @@
-from typing import List
-
 from . import colors, exceptions
 from .common import bytes_to_unit, plural
-from .db import Invocation, InvocationOp
+from .db import Invocation
 from .fileset import FileSet
 
 
 def confirm_n_files_generic(verb: str, fs: FileSet) -> str:
-    file_count = fs.file_count()
-    dir_count = fs.dir_count()
-    size_bytes = fs.size_bytes()
+    size = fs.calculate_size()
+    file_count = size.file_count
+    dir_count = size.dir_count
+    size_bytes = size.size_bytes
 
     s1 = plural(file_count, "file", color=True)
     s2 = plural(dir_count, "directory", "directories", color=True)
@@ -31,9 +30,9 @@ def confirm_n_files_generic(verb: str, fs: FileSet) -> str:
             raise exceptions.Impossible
 
 
-def confirm_undo(invocation: Invocation, ops: List[InvocationOp]) -> str:
-    # assumption: `ops` is not empty
+def confirm_undo(invocation: Invocation, num_ops: int) -> str:
+    # assumption: `num_ops` is not zero
     # TODO: handle empty cmdline
     # TODO: show time command was run and warn if it was a while ago
-    s1 = plural(len(ops), "op", color=True)
+    s1 = plural(num_ops, "op", color=True)
     return f"Undo `{colors.code(invocation.cmdline)}` command with {s1}? "
@@ -131,6 +131,19 @@ class NotADirectory(Base):
         return f"{self.path} is not a directory"
 
 
+class UnknownGlobGroup(Base):
+    group: int
+    pattern: str
+
+    def __init__(self, *, group: int, pattern: str) -> None:
+        super().__init__()
+        self.group = group
+        self.pattern = pattern
+
+    def fancy(self) -> str:
+        return f"#{self.group} does not refer to a wildcard in {self.pattern!r}"
+
+
 # not a subclass of BatchOpError as it should not be caught
 class Impossible(Exception):
     pass
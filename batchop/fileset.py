@@ -1,9 +1,11 @@
 import decimal
 import enum
+import os
 import re
+import stat
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterator, List, Optional, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from . import exceptions, filters
 from .common import (
@@ -13,28 +15,59 @@ from .common import (
     PathLike,
     PatternLike,
     abspath,
+    ilen,
     unit_to_multiple,
 )
 
 
+Predicate = Callable[[os.DirEntry], Tuple[bool, bool]]
+# (included, subdirs) where `included` is a list of (entry, is_dir, is_root) and `subdirs` is a list
+# of (path, is_root, skip_filters)
+ScanResult = Tuple[List[Tuple[os.DirEntry, bool, bool]], List[Tuple[str, bool, bool]]]
+
+
 class IterateBehavior(enum.Enum):
     DEFAULT = 1
     ALWAYS_INCLUDE_CHILDREN = 2
     ALWAYS_EXCLUDE_CHILDREN = 3
 
 
-@dataclass
+@dataclass(slots=True)
 class FileSetItem:
     path: AbsolutePath
     is_dir: bool
     is_root: bool
     size_bytes: int
+    inode: int
+
+
+@dataclass
+class FileSetSize:
+    file_count: int
+    dir_count: int
+    size_bytes: int
 
 
 @dataclass
 class FileSet:
     items: List[FileSetItem]
 
+    def calculate_size(self) -> FileSetSize:
+        # one pass instead of calling each of the methods below
+        file_count = 0
+        dir_count = 0
+        size_bytes = 0
+        for item in self.items:
+            if item.is_dir:
+                dir_count += 1
+            else:
+                file_count += 1
+            size_bytes += item.size_bytes
+
+        return FileSetSize(
+            file_count=file_count, dir_count=dir_count, size_bytes=size_bytes
+        )
+
     def file_count(self) -> int:
         return sum(1 for item in self.items if not item.is_dir)
 
@@ -56,6 +89,61 @@ class FileSet:
     def is_empty(self) -> bool:
         return len(self.items) == 0
 
+    # Returns the items that also pass `_filters`, without walking the file tree again.
+    #
+    # Adding filters can only shrink a file set, so this gives the same result as resolving again
+    # with the extra filters. This is only true for `recursive=False`, since with `recursive=True` the
+    # children of an included directory aren't subject to the filters at all.
+    def narrow(self, root_like: PathLike, _filters: List[filters.Filter]) -> "FileSet":
+        root = abspath(root_like)
+        _filters = [f.make_absolute(root) for f in _filters]
+
+        # directory --> whether the walk would have recursed into it under the new filters
+        recurse_cache: Dict[Path, bool] = {root: True}
+
+        def should_recurse_into(d: Path) -> bool:
+            r = recurse_cache.get(d)
+            if r is None:
+                _, should_recurse = _test_path(_filters, d)
+                r = should_recurse and should_recurse_into(d.parent)
+                recurse_cache[d] = r
+            return r
+
+        kept = []
+        for item in self.items:
+            should_include, _ = _test_path(_filters, item.path)
+            if should_include and should_recurse_into(item.path.parent):
+                kept.append(item)
+
+        # an item is a root iff its parent is not in the file set
+        kept_paths = set(item.path for item in kept)
+        return FileSet(
+            [
+                FileSetItem(
+                    item.path,
+                    is_dir=item.is_dir,
+                    is_root=item.path.parent not in kept_paths,
+                    size_bytes=item.size_bytes,
+                    inode=item.inode,
+                )
+                for item in kept
+            ]
+        )
+
+
+def _test_path(_filters: List[filters.Filter], p: Path) -> Tuple[bool, bool]:
+    should_include = True
+    should_recurse = True
+    for f in _filters:
+        include_self, include_children = filters.expand_result(f.test(p))
+        should_include = should_include and include_self
+        should_recurse = should_recurse and include_children
+        # no later filter can change the answer
+        if not should_include and not should_recurse:
+            break
+
+    return should_include, should_recurse
+
 
 class FilterSet:
     _filters: List[filters.Filter]
@@ -70,7 +158,7 @@ class FilterSet:
     def push(self, f: filters.Filter) -> None:
         self._filters.append(f)
 
-    def extend(self, fs: List[filters.Filter]) -> None:
+    def extend(self, fs: Iterable[filters.Filter]) -> None:
         self._filters.extend(fs)
 
     def clear(self) -> None:
@@ -79,74 +167,172 @@ class FilterSet:
     def get_filters(self) -> List[filters.Filter]:
         return self._filters
 
-    def resolve(self, root_like: PathLike, *, recursive: bool) -> FileSet:
+    # if `threads` is more than 1, directories are listed concurrently and items are returned in no
+    # particular order
+    #
+    # if `roots_only` is true, only the items that `FileSet.exclude_children` would return are found;
+    # with `recursive=True` the walk also doesn't descend into included directories at all, but with
+    # `recursive=False` it must, since an included directory can contain excluded directories with
+    # included (and so root) items below them
+    def resolve(
+        self,
+        root_like: PathLike,
+        *,
+        recursive: bool,
+        threads: int = 1,
+        roots_only: bool = False,
+    ) -> FileSet:
+        return FileSet(
+            list(
+                self.iterate(
+                    root_like,
+                    recursive=recursive,
+                    threads=threads,
+                    roots_only=roots_only,
+                )
+            )
+        )
+
+    # like `resolve` but yields items as they are found instead of collecting them first
+    def iterate(
+        self,
+        root_like: PathLike,
+        *,
+        recursive: bool,
+        threads: int = 1,
+        roots_only: bool = False,
+    ) -> Iterator[FileSetItem]:
+        root = abspath(root_like)
+        exact = self._get_exact_paths(root)
+        if exact is not None:
+            yield from self._resolve_exact(exact)
+            return
+
+        for entry, is_dir, is_root in self._walk(
+            root, recursive=recursive, threads=threads, roots_only=roots_only
+        ):
+            # TODO: handle stat() exception
+            size_bytes = entry.stat().st_size if not is_dir else 0
+            yield FileSetItem(
+                AbsolutePath(Path(entry.path)),
+                is_dir=is_dir,
+                is_root=is_root,
+                size_bytes=size_bytes,
+                # free on POSIX since `readdir` returns it
+                inode=entry.inode(),
+            )
+
+    # equivalent to `len(self.resolve(...))` but doesn't construct a `Path` or call `stat()` for each
+    # item
+    def count(self, root_like: PathLike, *, recursive: bool, threads: int = 1) -> int:
         root = abspath(root_like)
+        exact = self._get_exact_paths(root)
+        if exact is not None:
+            return ilen(self._resolve_exact(exact))
+
+        return ilen(self._walk(root, recursive=recursive, threads=threads))
+
+    def _get_exact_paths(self, root: AbsolutePath) -> Optional[List[AbsolutePath]]:
         for f in self._filters:
             if isinstance(f, filters.FilterIsExactly):
                 f = f.make_absolute(root)
-                return self._resolve_exact(f.paths)  # type: ignore
+                return f.paths  # type: ignore
+
+        return None
+
+    # yields (entry, is_dir, is_root) for each item that is included
+    def _walk(
+        self,
+        root: AbsolutePath,
+        *,
+        recursive: bool,
+        threads: int = 1,
+        roots_only: bool = False,
+    ) -> Iterator[Tuple[os.DirEntry, bool, bool]]:
+        _filters = filters.fuse_size_filters(
+            [f.make_absolute(root) for f in self._filters]
+        )
+        # Filters that only ever exclude an entry along with its whole subtree are applied as soon
+        # as a directory is listed, so excluded entries are never pushed, popped, or tested again.
+        excluders = tuple(f.excludes_entry for f in _filters if f.excludes_only)
+        predicate = _compile_predicate([f for f in _filters if not f.excludes_only])
+
+        def is_excluded(entry: os.DirEntry) -> bool:
+            for excludes in excluders:
+                if excludes(entry):
+                    return True
+            return False
+
+        # Lists one directory and decides for each child whether to include it and whether to
+        # recurse into it.
+        #
+        # `os.scandir` is used instead of `Path.iterdir` because `DirEntry` caches the results of
+        # `is_dir()` and `stat()`, and on most platforms `is_dir()` doesn't need a syscall at all.
+        root_str = str(root)
+
+        def scan(path: str, is_root: bool, skip_filters: bool) -> ScanResult:
+            try:
+                it = os.scandir(path)
+            except PermissionError:
+                # an unreadable directory below the root is skipped rather than failing the walk
+                if path == root_str:
+                    raise
+                return [], []
+
+            included = []
+            subdirs = []
+            with it:
+                for entry in it:
+                    if skip_filters:
+                        # everything under an included directory is included, even if hidden
+                        should_include, should_recurse = True, True
+                    elif is_excluded(entry):
+                        continue
+                    else:
+                        should_include, should_recurse = predicate(entry)
+
+                    is_dir = entry.is_dir()
+                    if should_include and (is_root or not roots_only):
+                        included.append((entry, is_dir, is_root))
+
+                    if (
+                        should_recurse
+                        and is_dir
+                        and not (roots_only and should_include and recursive)
+                    ):
+                        child_is_root = not should_include
+                        subdirs.append(
+                            (entry.path, child_is_root, not child_is_root and recursive)
+                        )
+
+            return included, subdirs
 
-        _filters = [f.make_absolute(root) for f in self._filters]
+        if threads > 1:
+            yield from _walk_parallel(scan, root_str, threads=threads)
+            return
 
-        r = []
         # TODO: does this give a reasonable iteration order?
-        # (path, is_root, skip_filters)
-        stack = [(p, True, False) for p in root.iterdir()]
+        stack = [(root_str, True, False)]
         while stack:
-            item, is_root, skip_filters = stack.pop()
-            is_dir = item.is_dir()
-            if skip_filters:
-                should_include, should_recurse = True, True
-            else:
-                should_include, should_recurse = self._test(_filters, item)
-
-            if should_include:
-                # TODO: handle stat() exception
-                size_bytes = item.stat().st_size if not is_dir else 0
-                r.append(
-                    FileSetItem(
-                        item, is_dir=is_dir, is_root=is_root, size_bytes=size_bytes
-                    )
-                )
-
-            if should_recurse and is_dir:
-                is_root = not should_include
-                for child in item.iterdir():
-                    stack.append(
-                        (
-                            child,
-                            is_root,
-                            # skip_filters=
-                            not is_root and recursive,
-                        )
-                    )
-
-        return FileSet(r)
+            included, subdirs = scan(*stack.pop())
+            yield from included
+            stack.extend(reversed(subdirs))
 
-    def _resolve_exact(self, paths: List[AbsolutePath]) -> FileSet:
-        items = []
+    def _resolve_exact(self, paths: List[AbsolutePath]) -> Iterator[FileSetItem]:
         for p in paths:
-            if not p.exists():
+            # TODO: handle other stat() exceptions
+            try:
+                st = p.stat()
+            except FileNotFoundError:
                 raise exceptions.FileNotFound(p)
 
-            # TODO: handle stat() exception
-            items.append(
-                FileSetItem(
-                    p,
-                    is_dir=p.is_dir(),
-                    is_root=True,
-                    size_bytes=p.stat().st_size,
-                )
+            yield FileSetItem(
+                p,
+                is_dir=stat.S_ISDIR(st.st_mode),
+                is_root=True,
+                size_bytes=st.st_size,
+                inode=st.st_ino,
             )
-        return FileSet(items)
-
-    @staticmethod
-    def _test(_filters: List[filters.Filter], item: Path) -> Tuple[bool, bool]:
-        # TODO: terminate filter application early if possible
-        results = [filters.expand_result(f.test(item)) for f in _filters]
-        should_include = all(include_self for include_self, _ in results)
-        should_recurse = all(include_children for _, include_children in results)
-        return should_include, should_recurse
 
     def is_file(self) -> "FilterSet":
         return self.copy_with(filters.FilterIsFile())
@@ -225,12 +411,95 @@ class FilterSet:
         return FilterSet(self._filters + [f])
 
 
+def _walk_parallel(
+    scan: Callable[[str, bool, bool], ScanResult],
+    root: str,
+    *,
+    threads: int,
+) -> Iterator[Tuple[os.DirEntry, bool, bool]]:
+    # imported here since it is slow to import and only needed if threads were requested
+    import concurrent.futures
+
+    # listing a directory is mostly waiting on syscalls, which release the GIL, so directories are
+    # scanned on worker threads while this generator hands back results as each one finishes
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=threads)
+    try:
+        pending = {pool.submit(scan, root, True, False)}
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                included, subdirs = future.result()
+                yield from included
+                for subdir in subdirs:
+                    pending.add(pool.submit(scan, *subdir))
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+# Combines the filters into one function that returns (should_include, should_recurse), so that the
+# walk makes one call per entry. It is rebuilt on each walk, so changes to the filter set are always
+# picked up.
+def _compile_predicate(_filters: List[filters.Filter]) -> Predicate:
+    if not _filters:
+        return lambda entry: (True, True)
+
+    if len(_filters) == 1:
+        test = _filters[0].test_entry
+        expand_result = filters.expand_result
+        return lambda entry: expand_result(test(entry))
+
+    # Filters whose result can prune the walk are run first, since we always need their
+    # `include_children` answer. After that, filters only affect whether the entry itself is
+    # included, so we can stop at the first one that says no -- ordered cheapest first.
+    ordered = sorted(_filters, key=lambda f: (not f.prunes, f.cost))
+    pruning = tuple(f.test_entry for f in ordered if f.prunes)
+    others = tuple(f.test_entry for f in ordered if not f.prunes)
+
+    def predicate(entry: os.DirEntry) -> Tuple[bool, bool]:
+        should_include = True
+        should_recurse = True
+        for test in pruning:
+            r = test(entry)
+            if isinstance(r, tuple):
+                include_self, include_children = r
+                if not include_self:
+                    should_include = False
+                if not include_children:
+                    should_recurse = False
+            elif not r:
+                should_include = False
+
+            if not should_include and not should_recurse:
+                return False, False
+
+        if not should_include:
+            return False, should_recurse
+
+        for test in others:
+            r = test(entry)
+            if isinstance(r, tuple):
+                r = r[0]
+            if not r:
+                return False, should_recurse
+
+        return True, should_recurse
+
+    return predicate
+
+
 def _n_times_unit(n: NumberLike, unit: str) -> int:
     multiple = unit_to_multiple(unit)
     if multiple is None:
         raise exceptions.UnknownSizeUnit(unit)
 
     if isinstance(n, str):
+        # only fractional sizes need exact decimal arithmetic; `isdecimal` rather than `isdigit`
+        # since the latter is also true for characters like '²' that `int` rejects
+        if n.isdecimal():
+            return int(n) * multiple
+
         n = decimal.Decimal(n)
 
     return int(n * multiple)
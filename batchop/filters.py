@@ -1,9 +1,11 @@
 import abc
 import fnmatch
+import functools
+import os
 import re
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Tuple, Union
+from typing import Callable, List, Optional, Tuple, Union
 
 from . import exceptions
 
@@ -20,11 +22,33 @@ def expand_result(r: Result) -> Tuple[bool, bool]:
 
 
 class Filter(abc.ABC):
+    __slots__ = ()
+
+    # whether `test` can ever return `include_children=False`
+    prunes = False
+    # rough relative cost of `test_entry`, used to decide what order to apply filters in:
+    #   0: only looks at the name
+    #   1: looks at the file type (usually free from `readdir`) or constructs a `Path`
+    #   2: needs a `stat` or other syscall
+    cost = 1
+    # whether `test` only ever returns `True` or `(False, False)`, in which case `excludes_entry`
+    # must say which
+    excludes_only = False
+
     # all subclasses must override this method
     @abc.abstractmethod
     def test(self, p: Path) -> Result:
         pass
 
+    # called while walking the file tree; subclasses that can answer from the directory entry alone
+    # (e.g., its name or its cached `stat()`) should override this to avoid constructing a `Path`
+    def test_entry(self, entry: os.DirEntry) -> Result:
+        return self.test(Path(entry.path))
+
+    # only called if `excludes_only` is set
+    def excludes_entry(self, entry: os.DirEntry) -> bool:
+        return self.test_entry(entry) is not True
+
     # only subclasses that internally store a path need to override this method
     # typical implementation:
     #   return FilterXYZ(_make_absolute(self.path, root))
@@ -37,61 +61,121 @@ class Filter(abc.ABC):
         return FilterNegated(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class FilterNegated(Filter):
     inner: Filter
 
+    @property  # type: ignore
+    def prunes(self) -> bool:  # type: ignore
+        return self.inner.prunes
+
+    @property  # type: ignore
+    def cost(self) -> int:  # type: ignore
+        return self.inner.cost
+
     def test(self, p: Path) -> Result:
-        r = self.inner.test(p)
-        if isinstance(r, tuple):
-            # TODO: is it always right to pass include_children through unchanged?
-            include_self, include_children = r
-            return not include_self, include_children
-        else:
-            return not r
+        return _negate_result(self.inner.test(p))
+
+    def test_entry(self, entry: os.DirEntry) -> Result:
+        return _negate_result(self.inner.test_entry(entry))
 
     def __str__(self) -> str:
         return f"not ({self.inner})"
 
 
-@dataclass
+def _negate_result(r: Result) -> Result:
+    if isinstance(r, tuple):
+        # TODO: is it always right to pass include_children through unchanged?
+        include_self, include_children = r
+        return not include_self, include_children
+    else:
+        return not r
+
+
+@dataclass(slots=True)
 class FilterTrue(Filter):
+    cost = 0
+
     def test(self, p: Path) -> Result:
         return True
 
+    def test_entry(self, entry: os.DirEntry) -> Result:
+        return True
+
     def __str__(self) -> str:
         return "always true"
 
 
-@dataclass
+@dataclass(slots=True)
 class FilterIsDirectory(Filter):
     def test(self, p: Path) -> Result:
         return p.is_dir()
 
+    def test_entry(self, entry: os.DirEntry) -> Result:
+        return entry.is_dir()
+
+    def negate(self) -> Filter:
+        return FilterIsNotDirectory()
+
     def __str__(self) -> str:
         return "is directory"
 
 
-@dataclass
+@dataclass(slots=True)
+class FilterIsNotDirectory(Filter):
+    def test(self, p: Path) -> Result:
+        return not p.is_dir()
+
+    def test_entry(self, entry: os.DirEntry) -> Result:
+        return not entry.is_dir()
+
+    def __str__(self) -> str:
+        return "is not directory"
+
+
+@dataclass(slots=True)
 class FilterIsFile(Filter):
     def test(self, p: Path) -> Result:
         return p.is_file()
 
+    def test_entry(self, entry: os.DirEntry) -> Result:
+        return entry.is_file()
+
+    def negate(self) -> Filter:
+        return FilterIsNotFile()
+
     def __str__(self) -> str:
         return "is file"
 
 
-@dataclass
+@dataclass(slots=True)
+class FilterIsNotFile(Filter):
+    def test(self, p: Path) -> Result:
+        return not p.is_file()
+
+    def test_entry(self, entry: os.DirEntry) -> Result:
+        return not entry.is_file()
+
+    def __str__(self) -> str:
+        return "is not file"
+
+
+@dataclass(slots=True)
 class FilterIsSpecial(Filter):
     def test(self, p: Path) -> Result:
         return not p.is_file() and not p.is_dir()
 
+    def test_entry(self, entry: os.DirEntry) -> Result:
+        return not entry.is_file() and not entry.is_dir()
+
     def __str__(self) -> str:
         return "is special file"
 
 
-@dataclass
+@dataclass(slots=True)
 class FilterIsEmpty(Filter):
+    cost = 2
+
     def test(self, p: Path) -> Result:
         if p.is_dir():
             return not any(p.iterdir())
@@ -99,11 +183,19 @@ class FilterIsEmpty(Filter):
             # TODO: handle stat() exception
             return p.stat().st_size == 0
 
+    def test_entry(self, entry: os.DirEntry) -> Result:
+        if entry.is_dir():
+            with os.scandir(entry.path) as it:
+                return next(it, None) is None
+        else:
+            # TODO: handle stat() exception
+            return entry.stat().st_size == 0
+
     def __str__(self) -> str:
         return "is empty"
 
 
-@dataclass
+@dataclass(slots=True)
 class FilterIsExactly(Filter):
     paths: List[Path]
 
@@ -117,47 +209,138 @@ class FilterIsExactly(Filter):
         return f"is exactly: {' '.join(map(repr, self.paths))}"
 
 
-@dataclass
+@dataclass(slots=True)
 class FilterIsLikePath(Filter):
     pattern: str
+    _match: Callable[[str], Optional[re.Match]] = field(
+        init=False, repr=False, compare=False
+    )
+
+    cost = 0
+
+    def __post_init__(self) -> None:
+        self._match = _compile_glob(self.pattern)
 
     def test(self, p: Path) -> Result:
         # TODO: case-insensitive file systems?
-        return fnmatch.fnmatch(p, self.pattern)  # type: ignore
+        return self._match(os.path.normcase(p)) is not None
+
+    def negate(self) -> Filter:
+        return FilterIsNotLikePath(self.pattern)
 
     def __str__(self) -> str:
         return f"is like {self.pattern!r} (whole-path)"
 
 
-@dataclass
+@dataclass(slots=True)
+class FilterIsNotLikePath(Filter):
+    pattern: str
+    _match: Callable[[str], Optional[re.Match]] = field(
+        init=False, repr=False, compare=False
+    )
+
+    cost = 0
+
+    def __post_init__(self) -> None:
+        self._match = _compile_glob(self.pattern)
+
+    def test(self, p: Path) -> Result:
+        return self._match(os.path.normcase(p)) is None
+
+    def __str__(self) -> str:
+        return f"is not like {self.pattern!r} (whole-path)"
+
+
+@dataclass(slots=True)
 class FilterIsLikeName(Filter):
     pattern: str
+    _match: Callable[[str], Optional[re.Match]] = field(
+        init=False, repr=False, compare=False
+    )
+
+    cost = 0
+
+    def __post_init__(self) -> None:
+        self._match = _compile_glob(self.pattern)
 
     def test(self, p: Path) -> Result:
         # TODO: case-insensitive file systems?
-        return fnmatch.fnmatch(p.name, self.pattern)  # type: ignore
+        return self._match(os.path.normcase(p.name)) is not None
+
+    def test_entry(self, entry: os.DirEntry) -> Result:
+        return self._match(os.path.normcase(entry.name)) is not None
+
+    def negate(self) -> Filter:
+        return FilterIsNotLikeName(self.pattern)
 
     def __str__(self) -> str:
         return f"is like {self.pattern!r} (name only)"
 
 
-@dataclass
+@dataclass(slots=True)
+class FilterIsNotLikeName(Filter):
+    pattern: str
+    _match: Callable[[str], Optional[re.Match]] = field(
+        init=False, repr=False, compare=False
+    )
+
+    cost = 0
+
+    def __post_init__(self) -> None:
+        self._match = _compile_glob(self.pattern)
+
+    def test(self, p: Path) -> Result:
+        return self._match(os.path.normcase(p.name)) is None
+
+    def test_entry(self, entry: os.DirEntry) -> Result:
+        return self._match(os.path.normcase(entry.name)) is None
+
+    def __str__(self) -> str:
+        return f"is not like {self.pattern!r} (name only)"
+
+
+# same semantics as `fnmatch.fnmatch`, but translated and compiled only once; cached since the REPL
+# constructs new filters for every line, usually with the same patterns
+@functools.lru_cache(maxsize=256)
+def _compile_glob(pattern: str) -> Callable[[str], Optional[re.Match]]:
+    return re.compile(fnmatch.translate(os.path.normcase(pattern))).match
+
+
+@dataclass(slots=True)
 class FilterMatches(Filter):
     pattern: re.Pattern
 
+    cost = 0
+
     def test(self, p: Path) -> Result:
         return self.pattern.match(p.name) is not None
 
+    def test_entry(self, entry: os.DirEntry) -> Result:
+        return self.pattern.match(entry.name) is not None
+
     def __str__(self) -> str:
         return f"matches regex {self.pattern!r}"
 
 
-@dataclass
+@dataclass(slots=True)
 class FilterIsInPath(Filter):
     path: Path
+    _prefix: str = field(init=False, repr=False, compare=False)
+
+    # only directories on the way down to `path` need to be walked
+    prunes = True
+
+    def __post_init__(self) -> None:
+        self._prefix = _path_prefix(self.path)
 
     def test(self, p: Path) -> Result:
-        return test_is_in_exact(self.path, p)
+        is_in = test_is_in_exact(self.path, p)
+        return (is_in, is_in or self.path.is_relative_to(p))
+
+    def test_entry(self, entry: os.DirEntry) -> Result:
+        entry_path = entry.path
+        is_in = entry_path.startswith(self._prefix)
+        return (is_in, is_in or self._prefix.startswith(entry_path + os.sep))
 
     def make_absolute(self, root: Path) -> "Filter":
         return FilterIsInPath(_make_absolute(self.path, root))
@@ -169,9 +352,15 @@ class FilterIsInPath(Filter):
         return f"is in {self.path!r}"
 
 
-@dataclass
+@dataclass(slots=True)
 class FilterIsNotInPath(Filter):
     path: Path
+    _prefix: str = field(init=False, repr=False, compare=False)
+
+    prunes = True
+
+    def __post_init__(self) -> None:
+        self._prefix = _path_prefix(self.path)
 
     def test(self, p: Path) -> Result:
         if test_is_in_exact(self.path, p):
@@ -181,6 +370,12 @@ class FilterIsNotInPath(Filter):
             # b/c we returned include_children=False above
             return True
 
+    def test_entry(self, entry: os.DirEntry) -> Result:
+        if entry.path.startswith(self._prefix):
+            return (True, False)
+        else:
+            return True
+
     def make_absolute(self, root: Path) -> "Filter":
         return FilterIsNotInPath(_make_absolute(self.path, root))
 
@@ -192,7 +387,13 @@ def test_is_in_exact(to_include, to_test):
     return to_test.is_relative_to(to_include) and to_test != to_include
 
 
-@dataclass
+# Paths found while walking are plain strings built by `os.scandir` from the (already normalized)
+# root, so `test_is_in_exact` reduces to a prefix check against this string.
+def _path_prefix(p: Path) -> str:
+    return os.path.join(str(p), "")
+
+
+@dataclass(slots=True)
 class FilterIsHidden(Filter):
     def test(self, p: Path) -> Result:
         # TODO: cross-platform?
@@ -206,8 +407,12 @@ class FilterIsHidden(Filter):
         return "is hidden"
 
 
-@dataclass
+@dataclass(slots=True)
 class FilterIsNotHidden(Filter):
+    prunes = True
+    cost = 0
+    excludes_only = True
+
     def test(self, p: Path) -> Result:
         # TODO: cross-platform?
         if p.name.startswith("."):
@@ -215,59 +420,150 @@ class FilterIsNotHidden(Filter):
         else:
             return True
 
+    def test_entry(self, entry: os.DirEntry) -> Result:
+        if entry.name.startswith("."):
+            return (False, False)
+        else:
+            return True
+
+    def excludes_entry(self, entry: os.DirEntry) -> bool:
+        return entry.name.startswith(".")
+
     def __str__(self) -> str:
         return "is not hidden"
 
 
-@dataclass
+@dataclass(slots=True)
 class FilterSizeGreater(Filter):
     byte_count: int
 
+    cost = 2
+
     def test(self, p: Path) -> Result:
         return p.is_file() and p.stat().st_size > self.byte_count
 
+    def test_entry(self, entry: os.DirEntry) -> Result:
+        return entry.is_file() and entry.stat().st_size > self.byte_count
+
     def __str__(self) -> str:
         # TODO: human-readable units
         return f"> {self.byte_count:,} bytes"
 
 
-@dataclass
+@dataclass(slots=True)
 class FilterSizeGreaterEqual(Filter):
     byte_count: int
 
+    cost = 2
+
     def test(self, p: Path) -> Result:
         return p.is_file() and p.stat().st_size >= self.byte_count
 
+    def test_entry(self, entry: os.DirEntry) -> Result:
+        return entry.is_file() and entry.stat().st_size >= self.byte_count
+
     def __str__(self) -> str:
         return f">= {self.byte_count:,} bytes"
 
 
-@dataclass
+@dataclass(slots=True)
 class FilterSizeLess(Filter):
     byte_count: int
 
+    cost = 2
+
     def test(self, p: Path) -> Result:
         return p.is_file() and p.stat().st_size < self.byte_count
 
+    def test_entry(self, entry: os.DirEntry) -> Result:
+        return entry.is_file() and entry.stat().st_size < self.byte_count
+
     def __str__(self) -> str:
         return f"< {self.byte_count:,} bytes"
 
 
-@dataclass
+@dataclass(slots=True)
 class FilterSizeLessEqual(Filter):
     byte_count: int
 
+    cost = 2
+
     def test(self, p: Path) -> Result:
         return p.is_file() and p.stat().st_size <= self.byte_count
 
+    def test_entry(self, entry: os.DirEntry) -> Result:
+        return entry.is_file() and entry.stat().st_size <= self.byte_count
+
     def __str__(self) -> str:
         return f"<= {self.byte_count:,} bytes"
 
 
-@dataclass
+# the conjunction of several size filters, both bounds inclusive; not produced by the parser, only by
+# `fuse_size_filters`
+@dataclass(slots=True)
+class FilterSizeRange(Filter):
+    min_bytes: int
+    max_bytes: Optional[int]
+
+    cost = 2
+
+    def test(self, p: Path) -> Result:
+        return p.is_file() and self._in_range(p.stat().st_size)
+
+    def test_entry(self, entry: os.DirEntry) -> Result:
+        return entry.is_file() and self._in_range(entry.stat().st_size)
+
+    def _in_range(self, size: int) -> bool:
+        return self.min_bytes <= size and (
+            self.max_bytes is None or size <= self.max_bytes
+        )
+
+    def __str__(self) -> str:
+        if self.max_bytes is None:
+            return f">= {self.min_bytes:,} bytes"
+        else:
+            return f"between {self.min_bytes:,} and {self.max_bytes:,} bytes"
+
+
+# replaces two or more size filters with a single `FilterSizeRange`, so each file is compared once
+def fuse_size_filters(_filters: List[Filter]) -> List[Filter]:
+    sizes = [f for f in _filters if isinstance(f, _size_filter_types)]
+    if len(sizes) < 2:
+        return _filters
+
+    min_bytes = 0
+    max_bytes: Optional[int] = None
+    for f in sizes:
+        if isinstance(f, FilterSizeGreater):
+            min_bytes = max(min_bytes, f.byte_count + 1)
+        elif isinstance(f, FilterSizeGreaterEqual):
+            min_bytes = max(min_bytes, f.byte_count)
+        elif isinstance(f, FilterSizeLess):
+            hi = f.byte_count - 1
+            max_bytes = hi if max_bytes is None else min(max_bytes, hi)
+        else:
+            hi = f.byte_count
+            max_bytes = hi if max_bytes is None else min(max_bytes, hi)
+
+    r = [f for f in _filters if not isinstance(f, _size_filter_types)]
+    r.append(FilterSizeRange(min_bytes, max_bytes))
+    return r
+
+
+_size_filter_types = (
+    FilterSizeGreater,
+    FilterSizeGreaterEqual,
+    FilterSizeLess,
+    FilterSizeLessEqual,
+)
+
+
+@dataclass(slots=True)
 class FilterHasExtension(Filter):
     ext: str
 
+    cost = 0
+
     def __init__(self, ext: str) -> None:
         if ext.startswith("."):
             self.ext = ext
@@ -277,13 +573,48 @@ class FilterHasExtension(Filter):
     def test(self, p: Path) -> Result:
         return p.suffix == self.ext
 
+    def test_entry(self, entry: os.DirEntry) -> Result:
+        return _suffix(entry.name) == self.ext
+
+    def negate(self) -> Filter:
+        return FilterDoesNotHaveExtension(self.ext)
+
     def __str__(self) -> str:
         return f"has extension {self.ext!r}"
 
 
-@dataclass
+@dataclass(slots=True)
+class FilterDoesNotHaveExtension(Filter):
+    ext: str
+
+    cost = 0
+
+    def __init__(self, ext: str) -> None:
+        if ext.startswith("."):
+            self.ext = ext
+        else:
+            self.ext = "." + ext
+
+    def test(self, p: Path) -> Result:
+        return p.suffix != self.ext
+
+    def test_entry(self, entry: os.DirEntry) -> Result:
+        return _suffix(entry.name) != self.ext
+
+    def __str__(self) -> str:
+        return f"does not have extension {self.ext!r}"
+
+
+@dataclass(slots=True)
 class FilterExclude(Filter):
     path: Path
+    _path_str: str = field(init=False, repr=False, compare=False)
+
+    prunes = True
+    excludes_only = True
+
+    def __post_init__(self) -> None:
+        self._path_str = str(self.path)
 
     def test(self, p: Path) -> Result:
         if self.path == p:
@@ -293,6 +624,15 @@ class FilterExclude(Filter):
             # b/c we returned include_children=False above
             return True
 
+    def test_entry(self, entry: os.DirEntry) -> Result:
+        if entry.path == self._path_str:
+            return (False, False)
+        else:
+            return True
+
+    def excludes_entry(self, entry: os.DirEntry) -> bool:
+        return entry.path == self._path_str
+
     def make_absolute(self, root: Path) -> "Filter":
         return FilterExclude(_make_absolute(self.path, root))
 
@@ -300,6 +640,15 @@ class FilterExclude(Filter):
         return f"exclude {self.path!r}"
 
 
+# same as `Path(name).suffix` without constructing a `Path`
+def _suffix(name: str) -> str:
+    i = name.rfind(".")
+    if 0 < i < len(name) - 1:
+        return name[i:]
+    else:
+        return ""
+
+
 def glob_pattern_to_filter(s: str):
     if "/" in s:
         return FilterIsLikePath(s)
@@ -307,12 +656,17 @@ def glob_pattern_to_filter(s: str):
         return FilterIsLikeName(s)
 
 
+def regex_pattern_to_filter(s: str) -> Filter:
+    # `FilterMatches` needs a compiled pattern; given the raw string it fails on the first `test`
+    return FilterMatches(re.compile(s))
+
+
 def pattern_to_filter(s: str) -> Filter:
     # delete '*.md'        -- glob pattern
     # delete /.*\\.md/     -- regex
     # delete __pycache__   -- path
     if s.startswith("/") and s.endswith("/"):
-        return FilterMatches(re.compile(s[1:-1]))
+        return regex_pattern_to_filter(s[1:-1])
     elif "*" in s or "?" in s or "[" in s:
         return glob_pattern_to_filter(s)
     else:
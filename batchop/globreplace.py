@@ -1,4 +1,8 @@
+import functools
 import re
+from typing import Callable, List, Optional, Sequence, Union
+
+from . import exceptions
 
 
 def glob_to_regex(globp: str) -> str:
@@ -6,8 +10,96 @@ def glob_to_regex(globp: str) -> str:
     return "^" + "(.+?)".join(map(re.escape, parts)) + "$"
 
 
+# substrings that any name matching the glob must contain
+def glob_literal_parts(globp: str) -> List[str]:
+    return [part for part in globp.split("*") if part]
+
+
 _glob_group_pattern = re.compile(r"#([0-9]+)")
 
 
 def glob_to_regex_repl(globp: str) -> str:
     return _glob_group_pattern.sub(r"\\\1", globp)
+
+
+# literal text interleaved with 1-based references to the glob's wildcards
+Template = List[Union[str, int]]
+
+
+def parse_template(globp: str) -> Template:
+    r: Template = []
+    pos = 0
+    for m in _glob_group_pattern.finditer(globp):
+        if m.start() > pos:
+            r.append(globp[pos : m.start()])
+        r.append(int(m.group(1)))
+        pos = m.end()
+
+    if pos < len(globp):
+        r.append(globp[pos:])
+
+    return r
+
+
+def expand_template(template: Template, groups: Sequence[str]) -> str:
+    return "".join(
+        part if isinstance(part, str) else groups[part - 1] for part in template
+    )
+
+
+# Returns a function that maps a name matching `old` to its new name, or returns `None` if the name
+# doesn't match.
+#
+# Most rename patterns have zero or one wildcards (`foo.txt`, `*.txt`, `IMG_*`), which can be
+# matched with plain string operations; the regex is only used for the general case.
+#
+# Cached since the REPL and scripts tend to repeat the same rename patterns.
+@functools.lru_cache(maxsize=256)
+def compile_renamer(old: str, new: str) -> Callable[[str], Optional[str]]:
+    nwildcards = old.count("*")
+    template = parse_template(new)
+    for part in template:
+        if isinstance(part, int) and not 1 <= part <= nwildcards:
+            raise exceptions.UnknownGlobGroup(group=part, pattern=old)
+
+    if nwildcards == 0:
+        renamed = expand_template(template, ())
+
+        def rename_literal(name: str) -> Optional[str]:
+            return renamed if name == old else None
+
+        return rename_literal
+    elif nwildcards == 1:
+        prefix, suffix = old.split("*")
+        start = len(prefix)
+        # the wildcard must match at least one character
+        min_length = len(prefix) + len(suffix) + 1
+
+        def rename_one_wildcard(name: str) -> Optional[str]:
+            if (
+                len(name) < min_length
+                or not name.startswith(prefix)
+                or not name.endswith(suffix)
+            ):
+                return None
+
+            return expand_template(template, (name[start : len(name) - len(suffix)],))
+
+        return rename_one_wildcard
+    else:
+        pattern = re.compile(glob_to_regex(old), re.DOTALL)
+        # cheap substring checks to skip most non-matching names without running the regex
+        literals = glob_literal_parts(old)
+
+        def rename_general(name: str) -> Optional[str]:
+            for literal in literals:
+                if literal not in name:
+                    return None
+
+            m = pattern.fullmatch(name)
+            if m is None:
+                return None
+
+            return expand_template(template, m.groups())
+
+        return rename_general
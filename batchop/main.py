@@ -1,15 +1,17 @@
 import argparse
+import functools
 import os
 import shlex
 import sys
 from pathlib import Path
-from typing import List
+from typing import Iterable, List, Tuple
 
 from . import colors, exceptions, parsing, __version__
 from .batchop import BatchOp
-from .common import err_and_bail, plural
+from .common import AbsolutePath, err_and_bail, plural, print_lines
 from .db import INVOCATION_CONTEXT_CLI
 from .fileset import FileSet, FilterSet
+from .filters import Filter
 
 
 def main() -> None:
@@ -33,6 +35,12 @@ def _main(argv: List[str]) -> None:
         "--no-color", action="store_true", help="Turn off colored output."
     )
     parser.add_argument("--sort", action="store_true")
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=1,
+        help="Number of threads to use for file-system operations.",
+    )
     parser.add_argument("--context", default=INVOCATION_CONTEXT_CLI)
     parser.add_argument("--version", action="version", version=__version__)
 
@@ -78,7 +86,7 @@ def _main(argv: List[str]) -> None:
         colors.disable()
 
     try:
-        bop = BatchOp(root, context=args.context)
+        bop = BatchOp(root, context=args.context, threads=args.threads)
         if args.subcommand == "count":
             main_count(bop, args.words)
         elif args.subcommand == "ls":
@@ -109,7 +117,7 @@ def _main(argv: List[str]) -> None:
                 dry_run=args.dry_run,
             )
         elif args.subcommand == "repl":
-            main_repl(dry_run=args.dry_run)
+            main_repl(root, dry_run=args.dry_run)
         elif args.subcommand == "rm":
             main_rm(
                 bop,
@@ -141,12 +149,12 @@ def main_count(bop: BatchOp, words: List[str]) -> None:
 def main_ls(bop: BatchOp, words: List[str], *, sort: bool = False) -> None:
     filterset = parsing.parse_query(" ".join(words))
 
-    paths = bop.list(filterset)
+    paths: Iterable[AbsolutePath] = bop.list(filterset)
     if sort:
-        paths.sort()
+        # sorting requires the full list, but otherwise stream paths as they are found
+        paths = sorted(paths)
 
-    for p in paths:
-        print(p.relative_to(bop.root))
+    print_lines(p.relative_to(bop.root) for p in paths)
 
 
 def main_mv(
@@ -209,10 +217,9 @@ def main_undo(bop: BatchOp, *, require_confirm: bool) -> None:
     bop.undo(require_confirm=require_confirm)
 
 
-def main_repl(*, dry_run: bool = False) -> None:
+def main_repl(root: Path, *, dry_run: bool = False) -> None:
     import readline  # noqa: F401
 
-    root = Path(".").absolute()
     filterset = FilterSet().is_not_hidden()
 
     if len(filterset.get_filters()) > 0:
@@ -223,14 +230,22 @@ def main_repl(*, dry_run: bool = False) -> None:
 
     # whether to re-calculate the file set on next iteration of loop
     recalculate = True
+    # filters added since the file set was last calculated -- if the only change is new filters, the
+    # current file set can be narrowed down instead of walking the file tree again
+    new_filters: List[Filter] = []
     fileset = FileSet([])
     while True:
         # TODO: default to ignoring .git + .gitignore?
         if recalculate:
-            fileset = filterset.resolve(root, recursive=False)
-            print(f"{plural(fileset.file_count(), 'file', color=True)}", end="")
+            if new_filters:
+                fileset = fileset.narrow(root, new_filters)
+                new_filters = []
+            else:
+                fileset = filterset.resolve(root, recursive=False)
+            size = fileset.calculate_size()
+            print(f"{plural(size.file_count, 'file', color=True)}", end="")
 
-            dir_count = fileset.dir_count()
+            dir_count = size.dir_count
             if dir_count > 0:
                 print(f", {plural(dir_count, 'directory', 'directories', color=True)}")
             else:
@@ -251,16 +266,17 @@ def main_repl(*, dry_run: bool = False) -> None:
 
         # TODO: other commands (and respect --dry-run)
         if s.lower() == "list":
-            for p in fileset:
-                print(p)
+            print_lines(fileset)
             continue
         elif s[0] == "!":
             cmd = s[1:]
             if cmd == "pop":
                 filterset.pop()
+                new_filters = []
                 recalculate = True
             elif cmd == "clear":
                 filterset.clear()
+                new_filters = []
                 recalculate = True
             elif cmd == "filter" or cmd == "filters":
                 for f in filterset.get_filters():
@@ -278,16 +294,23 @@ def main_repl(*, dry_run: bool = False) -> None:
             continue
 
         try:
-            tokens = parsing.tokenize(s)
-            filters = parsing.parse_preds(tokens)
+            filters = _parse_repl_line(s)
         except exceptions.Base as e:
             print(f"{colors.danger('error:')} {e.fancy()}")
             continue
 
         filterset.extend(filters)
+        new_filters.extend(filters)
         recalculate = True
 
 
+# Cached since the same filters tend to be entered again after `!pop` or `!clear`. A tuple is returned
+# so the cached result can't be mutated by the caller.
+@functools.lru_cache(maxsize=256)
+def _parse_repl_line(s: str) -> Tuple[Filter, ...]:
+    return tuple(parsing.parse_preds(parsing.tokenize(s)))
+
+
 def _check_files_and_query(files: List[str], query: str) -> FilterSet:
     # TODO: better error messages
     if files and query:
@@ -1,10 +1,11 @@
+import re
 from dataclasses import dataclass
-from typing import Any, List, Optional, Tuple, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from . import exceptions, filters
 from .fileset import FilterSet
 from .filters import Filter
-from .patterns import PATTERNS, BasePattern
+from .patterns import PATTERNS, BasePattern, Description, possible_first_tokens
 
 
 @dataclass
@@ -107,11 +108,13 @@ def parse_np_and_preds(
 
 def parse_preds(tokens: List[str], *, trailing_ok: bool = False) -> List[Filter]:
     filters = []
+    lowered = [token.lower() for token in tokens]
     i = 0
     while i < len(tokens):
         matched_one = False
-        for description in PATTERNS:
-            m = try_phrase_match(description.patterns, tokens[i:])
+        candidates = _patterns_by_first_token.get(lowered[i], _patterns_fallback)
+        for description in candidates:
+            m = try_phrase_match(description.patterns, tokens[i:], lowered[i:])
             if m is not None:
                 i += m.tokens_consumed
                 if description.filter_constructor is not None:
@@ -134,6 +137,30 @@ def parse_preds(tokens: List[str], *, trailing_ok: bool = False) -> List[Filter]
     return filters
 
 
+def _index_patterns() -> Tuple[Dict[str, List[Description]], List[Description]]:
+    by_first_token: Dict[str, List[int]] = {}
+    fallback = []
+    for i, description in enumerate(PATTERNS):
+        first_tokens = possible_first_tokens(description.patterns)
+        if first_tokens is None:
+            fallback.append(i)
+        else:
+            for token in first_tokens:
+                by_first_token.setdefault(token, []).append(i)
+
+    # patterns are tried in their original order, so merge the ones that could start with anything
+    # back into each list
+    index = {
+        token: [PATTERNS[i] for i in sorted(indices + fallback)]
+        for token, indices in by_first_token.items()
+    }
+    return index, [PATTERNS[i] for i in fallback]
+
+
+# only the patterns that could possibly match a phrase starting with a given (lowercased) token
+_patterns_by_first_token, _patterns_fallback = _index_patterns()
+
+
 def parse_np(tokens: List[str]) -> List[Filter]:
     if len(tokens) == 0:
         raise exceptions.SyntaxEmptyInput
@@ -181,7 +208,7 @@ def adj_to_filter(token: str) -> Optional[Filter]:
         return None
 
 
-@dataclass
+@dataclass(slots=True)
 class PhraseMatch:
     captures: List[Any]
     negated: bool
@@ -189,8 +216,13 @@ class PhraseMatch:
 
 
 def try_phrase_match(
-    patterns: List[BasePattern], tokens: List[str]
+    patterns: List[BasePattern],
+    tokens: List[str],
+    lowered: Optional[List[str]] = None,
 ) -> Optional[PhraseMatch]:
+    if lowered is None:
+        lowered = [token.lower() for token in tokens]
+
     captures = []
     negated = False
     i = 0
@@ -199,10 +231,12 @@ def try_phrase_match(
         if i >= len(tokens):
             # in case patterns ends with optional patterns
             token = ""
+            token_lowered = ""
         else:
             token = tokens[i]
+            token_lowered = lowered[i]
 
-        m = pattern.test(token)
+        m = pattern.test(token, token_lowered)
         if m is not None:
             if m.consumed:
                 i += 1
@@ -223,50 +257,13 @@ def try_phrase_match(
     return PhraseMatch(captures=captures, negated=negated, tokens_consumed=i)
 
 
-def tokenize(cmdstr: str) -> List[str]:
-    r = []
-    i = 0
+# A quoted string runs to the matching quote (or to the end of the input if it is unterminated);
+# otherwise a word runs until whitespace or a quote. Whitespace in between is skipped by `finditer`.
+#
+# TODO: backslash escapes
+_token_pattern = re.compile(r"""'([^']*)'?|"([^"]*)"?|([^\s'"]+)""")
 
-    while i < len(cmdstr):
-        c = cmdstr[i]
-        if c.isspace():
-            i = consume_whitespace(cmdstr, i)
-            continue
-        elif c == "'" or c == '"':
-            word, i = consume_quote(cmdstr, i + 1, c)
-        else:
-            word, i = consume_word(cmdstr, i)
-
-        r.append(word)
-
-    return r
 
-
-def consume_word(s: str, i: int) -> Tuple[str, int]:
-    start = i
-    while i < len(s):
-        c = s[i]
-        if c.isspace() or c == "'" or c == '"':
-            break
-        i += 1
-
-    return s[start:i], i
-
-
-def consume_whitespace(s: str, i: int) -> int:
-    while i < len(s) and s[i].isspace():
-        i += 1
-
-    return i
-
-
-def consume_quote(s: str, i: int, delimiter: str) -> Tuple[str, int]:
-    start = i
-    while i < len(s):
-        # TODO: backslash escapes
-        c = s[i]
-        if c == delimiter:
-            break
-        i += 1
-
-    return s[start:i], i + 1
+def tokenize(cmdstr: str) -> List[str]:
+    # exactly one group participates in each match
+    return [m.group(m.lastindex or 0) for m in _token_pattern.finditer(cmdstr)]
@@ -1,15 +1,15 @@
 import abc
 import decimal
 import re
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, List, Optional
+from typing import Any, FrozenSet, List, Optional
 
 from . import filters
 from .common import unit_to_multiple
 
 
-@dataclass
+@dataclass(slots=True)
 class WordMatch:
     captured: Optional[Any]
     consumed: bool = True
@@ -17,34 +17,43 @@ class WordMatch:
 
 
 class BasePattern(abc.ABC):
+    __slots__ = ()
+
+    # `lowered` is `token.lower()`, computed once by the caller rather than by every pattern
     @abc.abstractmethod
-    def test(self, token: str) -> Optional[WordMatch]:
+    def test(self, token: str, lowered: str) -> Optional[WordMatch]:
         pass
 
 
-@dataclass
+@dataclass(slots=True)
 class Opt(BasePattern):
     pattern: BasePattern
 
-    def test(self, token: str) -> Optional[WordMatch]:
-        m = self.pattern.test(token)
+    def test(self, token: str, lowered: str) -> Optional[WordMatch]:
+        m = self.pattern.test(token, lowered)
         if m is not None:
             return m
         else:
             return WordMatch(captured=None, consumed=False)
 
 
-@dataclass
+@dataclass(slots=True)
 class Lit(BasePattern):
     literal: str
     case_sensitive: bool = False
     captures: bool = False
+    _literal_cmp: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self._literal_cmp = (
+            self.literal if self.case_sensitive else self.literal.lower()
+        )
 
-    def test(self, token: str) -> Optional[WordMatch]:
+    def test(self, token: str, lowered: str) -> Optional[WordMatch]:
         if self.case_sensitive:
-            matches = token == self.literal
+            matches = token == self._literal_cmp
         else:
-            matches = token.lower() == self.literal.lower()
+            matches = lowered == self._literal_cmp
 
         if matches:
             captured = token if self.captures else None
@@ -53,22 +62,24 @@ class Lit(BasePattern):
             return None
 
 
-@dataclass
+@dataclass(slots=True)
 class AnyLit(BasePattern):
     literals: List[str]
     case_sensitive: bool = False
     captures: bool = False
+    _literals_cmp: FrozenSet[str] = field(init=False, repr=False, compare=False)
 
-    def test(self, token: str) -> Optional[WordMatch]:
-        matches = False
-        for literal in self.literals:
-            if self.case_sensitive:
-                matches = token == literal
-            else:
-                matches = token.lower() == literal.lower()
+    def __post_init__(self) -> None:
+        if self.case_sensitive:
+            self._literals_cmp = frozenset(self.literals)
+        else:
+            self._literals_cmp = frozenset(literal.lower() for literal in self.literals)
 
-            if matches:
-                break
+    def test(self, token: str, lowered: str) -> Optional[WordMatch]:
+        if self.case_sensitive:
+            matches = token in self._literals_cmp
+        else:
+            matches = lowered in self._literals_cmp
 
         if matches:
             captured = token if self.captures else None
@@ -77,18 +88,18 @@ class AnyLit(BasePattern):
             return None
 
 
-@dataclass
+@dataclass(slots=True)
 class Not(BasePattern):
-    def test(self, token: str) -> Optional[WordMatch]:
-        if token.lower() == "not":
+    def test(self, token: str, lowered: str) -> Optional[WordMatch]:
+        if lowered == "not":
             return WordMatch(captured=None, negated=True)
         else:
             return WordMatch(captured=None, consumed=False)
 
 
-@dataclass
+@dataclass(slots=True)
 class Decimal(BasePattern):
-    def test(self, token: str) -> Optional[WordMatch]:
+    def test(self, token: str, lowered: str) -> Optional[WordMatch]:
         try:
             captured = decimal.Decimal(token)
         except decimal.InvalidOperation:
@@ -97,9 +108,9 @@ class Decimal(BasePattern):
             return WordMatch(captured=captured)
 
 
-@dataclass
+@dataclass(slots=True)
 class Int(BasePattern):
-    def test(self, token: str) -> Optional[WordMatch]:
+    def test(self, token: str, lowered: str) -> Optional[WordMatch]:
         try:
             captured = int(token, base=0)
         except ValueError:
@@ -108,18 +119,18 @@ class Int(BasePattern):
             return WordMatch(captured=captured)
 
 
-@dataclass
+@dataclass(slots=True)
 class String(BasePattern):
-    def test(self, token: str) -> Optional[WordMatch]:
+    def test(self, token: str, lowered: str) -> Optional[WordMatch]:
         if token != "":
             return WordMatch(captured=token)
         else:
             return None
 
 
-@dataclass
+@dataclass(slots=True)
 class PathString(BasePattern):
-    def test(self, token: str) -> Optional[WordMatch]:
+    def test(self, token: str, lowered: str) -> Optional[WordMatch]:
         if token != "":
             return WordMatch(captured=Path(token))
         else:
@@ -131,9 +142,9 @@ _size_unit_pattern = re.compile(
 )
 
 
-@dataclass
+@dataclass(slots=True)
 class SizeUnit(BasePattern):
-    def test(self, token: str) -> Optional[WordMatch]:
+    def test(self, token: str, lowered: str) -> Optional[WordMatch]:
         # TODO: allow space in between size and unit
         m = _size_unit_pattern.match(token)
         if m is None:
@@ -145,16 +156,46 @@ class SizeUnit(BasePattern):
         if multiple is None:
             return None
 
-        captured = int(decimal.Decimal(n) * multiple)
+        # only fractional sizes need exact decimal arithmetic (same check as `fileset._n_times_unit`)
+        if n.isdecimal():
+            captured = int(n) * multiple
+        else:
+            captured = int(decimal.Decimal(n) * multiple)
         return WordMatch(captured=captured)
 
 
-@dataclass
+@dataclass(slots=True)
 class Description:
     patterns: List[BasePattern]
     filter_constructor: Any
 
 
+def possible_first_tokens(patterns: List[BasePattern]) -> Optional[FrozenSet[str]]:
+    # the lowercased tokens that a phrase matching `patterns` could start with, or `None` if it
+    # could start with anything
+    r: List[str] = []
+    for pattern in patterns:
+        optional = False
+        if isinstance(pattern, Opt):
+            pattern = pattern.pattern
+            optional = True
+
+        if isinstance(pattern, Lit):
+            r.append(pattern.literal.lower())
+        elif isinstance(pattern, AnyLit):
+            r.extend(literal.lower() for literal in pattern.literals)
+        elif isinstance(pattern, Not):
+            r.append("not")
+            optional = True
+        else:
+            return None
+
+        if not optional:
+            return frozenset(r)
+
+    return None
+
+
 PATTERNS = [
     # 'that is a file'
     Description(
@@ -186,7 +227,7 @@ PATTERNS = [
     # 'that matches X'
     Description(
         [Opt(Lit("that")), Lit("matches"), String()],
-        filters.FilterMatches,
+        filters.regex_pattern_to_filter,
     ),
     # 'that is empty'
     Description(
@@ -1,3 +1,6 @@
+import os
+from unittest.mock import patch
+
 from batchop import exceptions
 from batchop.batchop import BatchOp
 from batchop.fileset import FilterSet
@@ -29,12 +32,127 @@ class TestDeleteCommand(BaseTmpDir):
         )
         self.assertEqual(bop.count(filterset), 0)
 
+        invocation = bop.db.get_last_invocation()
+        ops = list(bop.db.iterate_invocation_ops(invocation.invocation_id))
+        invocation_dir = bop.backup_dir() / invocation.invocation_id
+        for op in ops:
+            self.assertEqual(op.path_after.parent.parent, invocation_dir)
+            self.assertTrue(op.path_after.exists())
+
         undo_result = bop.undo(require_confirm=False)
 
         self.assertEqual(undo_result.num_ops, 2)
         self.assertEqual(bop.count(filterset), original_count)
+        self.assertFalse(invocation_dir.exists())
         self.assert_unchanged()
 
+    def test_delete_api_threaded(self):
+        bop = BatchOp(self.tmpdirpath, threads=4)
+        filterset = FilterSet().is_file().is_empty()
+
+        bop.delete(filterset, require_confirm=False)
+
+        self.assertEqual(bop.count(filterset), 0)
+        self.assert_file_not_exists("empty_file.txt")
+        self.assert_file_not_exists("misc/empty_file.txt")
+
+        bop.undo(require_confirm=False)
+
+        self.assert_unchanged()
+
+    def test_undo_delete_backup_missing(self):
+        bop = BatchOp(self.tmpdirpath)
+        filterset = FilterSet().is_file().is_empty()
+
+        delete_result = bop.delete(filterset, require_confirm=False)
+        self.assertEqual(len(delete_result.paths_deleted), 2)
+
+        # as if a previous undo had failed after restoring only one of the files
+        invocation = bop.db.get_last_invocation()
+        op = next(bop.db.iterate_invocation_ops(invocation.invocation_id))
+        os.remove(op.path_after)
+
+        undo_result = bop.undo(require_confirm=False)
+
+        self.assertEqual(undo_result.num_ops, 2)
+        self.assertEqual(bop.count(filterset), 1)
+
+    def test_delete_many_files_threaded(self):
+        for i in range(4):
+            d = os.path.join(self.tmpdirpath, f"many{i}")
+            os.mkdir(d)
+            for j in range(25):
+                with open(os.path.join(d, f"{j}.tmp"), "w"):
+                    pass
+
+        bop = BatchOp(self.tmpdirpath, threads=4)
+        filterset = FilterSet().with_ext("tmp")
+
+        delete_result = bop.delete(filterset, require_confirm=False)
+
+        self.assertEqual(len(delete_result.paths_deleted), 100)
+        self.assertEqual(bop.count(filterset), 0)
+
+        bop.undo(require_confirm=False)
+
+        self.assertEqual(bop.count(filterset), 100)
+
+    def test_delete_many_files(self):
+        many = os.path.join(self.tmpdirpath, "many")
+        os.mkdir(many)
+        for i in range(300):
+            with open(os.path.join(many, f"{i}.tmp"), "w"):
+                pass
+
+        bop = BatchOp(self.tmpdirpath)
+        filterset = FilterSet().with_ext("tmp")
+
+        # make sure undo ops written in several batches are all recorded, and backups are split
+        # across several directories
+        with patch("batchop.batchop._UNDO_FLUSH_THRESHOLD", 128):
+            with patch("batchop.batchop._BACKUP_SHARD_SIZE", 64):
+                delete_result = bop.delete(filterset, require_confirm=False)
+
+        self.assertEqual(len(delete_result.paths_deleted), 300)
+        self.assertEqual(os.listdir(many), [])
+
+        invocation = bop.db.get_last_invocation()
+        invocation_dir = bop.backup_dir() / invocation.invocation_id
+        shards = sorted(os.listdir(invocation_dir))
+        self.assertEqual(shards, ["0000", "0001", "0002", "0003", "0004"])
+        for shard in shards:
+            self.assertLessEqual(len(os.listdir(invocation_dir / shard)), 64)
+
+        bop.undo(require_confirm=False)
+
+        self.assertEqual(len(os.listdir(many)), 300)
+        self.assertFalse(invocation_dir.exists())
+
+    def test_delete_rolled_back_on_failure(self):
+        for i in range(4):
+            d = os.path.join(self.tmpdirpath, f"many{i}")
+            os.mkdir(d)
+            for j in range(25):
+                with open(os.path.join(d, f"{j}.tmp"), "w"):
+                    pass
+        original_tree = self._list_files()
+
+        real_rename = os.rename
+
+        def failing_rename(src, dst, **kwargs):
+            if os.path.basename(src) == "20.tmp" and "many2" in str(src):
+                raise PermissionError(src)
+            return real_rename(src, dst, **kwargs)
+
+        bop = BatchOp(self.tmpdirpath)
+        filterset = FilterSet().with_ext("tmp")
+        with patch("os.rename", failing_rename):
+            with patch.object(os, "supports_dir_fd", set()):
+                with self.assertRaises(PermissionError):
+                    bop.delete(filterset, require_confirm=False)
+
+        self.assertEqual(self._list_files(), original_tree)
+
 
 class TestMoveCommand(BaseTmpDir):
     def test_move_script(self):
@@ -53,6 +171,16 @@ class TestMoveCommand(BaseTmpDir):
 
         self.assert_unchanged()
 
+    def test_move_files_existing(self):
+        with self.assertRaises(exceptions.PathCollision):
+            self.bop.move(
+                FilterSet().is_exactly(["misc/empty_file.txt"]),
+                ".",
+                require_confirm=False,
+            )
+
+        self.assert_unchanged()
+
     def test_move_api(self):
         bop = BatchOp(self.tmpdirpath)
         filterset = FilterSet().is_like("*-ch*.txt")
@@ -112,3 +240,41 @@ class TestRenameCommand(BaseTmpDir):
         bop.undo(require_confirm=False)
 
         self.assert_unchanged()
+
+    def test_rename_files_existing(self):
+        bop = BatchOp(self.tmpdirpath)
+
+        with self.assertRaises(exceptions.PathCollision):
+            bop.rename(
+                "pride-and-prejudice-ch1.txt",
+                "pride-and-prejudice-ch2.txt",
+                require_confirm=False,
+            )
+
+        self.assert_unchanged()
+
+
+class TestChooseDirectory(BaseTmpDir):
+    def test_environment_respected(self):
+        home1 = os.path.join(self.tmpdirpath, "home1")
+        home2 = os.path.join(self.tmpdirpath, "home2")
+        os.makedirs(os.path.join(home2, ".local", "share"))
+
+        with patch.dict(os.environ, {"HOME": home1}):
+            os.environ.pop("BATCHOP_DIR", None)
+            os.environ.pop("XDG_DATA_HOME", None)
+            self.assertEqual(
+                str(BatchOp._choose_directory()), os.path.join(home1, ".batchop")
+            )
+
+            os.environ["HOME"] = home2
+            self.assertEqual(
+                str(BatchOp._choose_directory()),
+                os.path.join(home2, ".local", "share", "batchop"),
+            )
+
+            os.environ["BATCHOP_DIR"] = "relative"
+            with patch("os.getcwd", return_value=home2):
+                self.assertEqual(
+                    str(BatchOp._choose_directory()), os.path.join(home2, "relative")
+                )
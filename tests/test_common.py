@@ -1,6 +1,8 @@
 import unittest
+from io import StringIO
+from unittest.mock import patch
 
-from batchop.common import bytes_to_unit
+from batchop.common import bytes_to_unit, ilen, plural, print_lines
 
 
 class TestUtilities(unittest.TestCase):
@@ -10,3 +12,33 @@ class TestUtilities(unittest.TestCase):
         self.assertEqual(bytes_to_unit(40278, color=False), "40.3 KB")
         self.assertEqual(bytes_to_unit(50_040_278, color=False), "50.0 MB")
         self.assertEqual(bytes_to_unit(238_150_040_278, color=False), "238.2 GB")
+
+        # ties round to even
+        self.assertEqual(bytes_to_unit(3450, color=False), "3.4 KB")
+        self.assertEqual(bytes_to_unit(3451, color=False), "3.5 KB")
+        self.assertEqual(bytes_to_unit(5550, color=False), "5.6 KB")
+        self.assertEqual(bytes_to_unit(1_250_000, color=False), "1.2 MB")
+        self.assertEqual(bytes_to_unit(1_350_000, color=False), "1.4 MB")
+        self.assertEqual(bytes_to_unit(999_950, color=False), "1000.0 KB")
+        self.assertEqual(bytes_to_unit(999_949, color=False), "999.9 KB")
+        self.assertEqual(bytes_to_unit(1000, color=False), "1.0 KB")
+
+    def test_ilen(self):
+        self.assertEqual(ilen([]), 0)
+        self.assertEqual(ilen(iter("abc")), 3)
+        self.assertEqual(ilen(x for x in range(1000) if x % 2 == 0), 500)
+
+    def test_plural(self):
+        self.assertEqual(plural(1, "file"), "1 file")
+        self.assertEqual(plural(0, "file"), "0 files")
+        self.assertEqual(plural(1_000, "file"), "1,000 files")
+        self.assertEqual(plural(1, "directory", "directories"), "1 directory")
+        self.assertEqual(plural(2, "directory", "directories"), "2 directories")
+
+    def test_print_lines(self):
+        for items in [[], ["a"], range(10)]:
+            with patch("batchop.common._PRINT_CHUNK_SIZE", 3):
+                with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+                    print_lines(items)
+
+            self.assertEqual(mock_stdout.getvalue(), "".join(f"{x}\n" for x in items))
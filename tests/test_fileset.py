@@ -1,3 +1,10 @@
+import decimal
+import os
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from batchop import filters, parsing
 from batchop.fileset import FilterSet
 
 from common import BaseTmpDir
@@ -52,3 +59,194 @@ class TestFilterSet(BaseTmpDir):
             FilterSet().is_file().is_empty().resolve(self.tmpdirpath, recursive=True)
         )
         self.assert_file_set_equals(fileset, ["empty_file.txt", "misc/empty_file.txt"])
+
+    def test_hidden_pruned(self):
+        os.makedirs(os.path.join(self.tmpdirpath, ".git", "objects"))
+        os.mkdir(os.path.join(self.tmpdirpath, "misc", ".cache"))
+
+        fileset = FilterSet().is_not_hidden().resolve(self.tmpdirpath, recursive=False)
+        self.assertFalse(any("/." in str(item.path) for item in fileset.items))
+
+        # hidden children of an included directory are still included
+        fileset = (
+            FilterSet()
+            .is_not_hidden()
+            .is_dir()
+            .resolve(self.tmpdirpath, recursive=True)
+        )
+        self.assertIn(
+            Path(self.tmpdirpath) / "misc" / ".cache",
+            [item.path for item in fileset.items],
+        )
+
+    def test_is_in_pruned(self):
+        scanned = []
+        real_scandir = os.scandir
+
+        def recording_scandir(path):
+            scanned.append(path)
+            return real_scandir(path)
+
+        with patch("os.scandir", recording_scandir):
+            fileset = (
+                FilterSet().is_in("misc").resolve(self.tmpdirpath, recursive=False)
+            )
+
+        self.assert_file_set_equals(fileset, ["misc/empty_file.txt"])
+        self.assertEqual(
+            sorted(scanned), [self.tmpdirpath, os.path.join(self.tmpdirpath, "misc")]
+        )
+
+    def test_matches_query(self):
+        # the parser used to hand `FilterMatches` the raw pattern string, which failed on resolve
+        for query in [
+            "files that matches '^pride-and-prejudice-ch'",
+            "/^pride-and-prejudice-/",
+        ]:
+            fileset = parsing.parse_query(query).resolve(
+                self.tmpdirpath, recursive=False
+            )
+            self.assert_file_set_equals(
+                fileset,
+                [
+                    "pride-and-prejudice/pride-and-prejudice-ch1.txt",
+                    "pride-and-prejudice/pride-and-prejudice-ch2.txt",
+                ],
+            )
+
+    def test_size_filters(self):
+        self.assertEqual(
+            FilterSet().size_gt("2", "kb").get_filters(),
+            [filters.FilterSizeGreater(2000)],
+        )
+        self.assertEqual(
+            FilterSet().size_le("1.5", "mb").get_filters(),
+            [filters.FilterSizeLessEqual(1_500_000)],
+        )
+        self.assertEqual(
+            FilterSet().size_lt(3, "b").get_filters(),
+            [filters.FilterSizeLess(3)],
+        )
+        # a digit that `int` can't parse falls through to `Decimal`, as before
+        with self.assertRaises(decimal.InvalidOperation):
+            FilterSet().size_gt("²", "kb")
+
+    @unittest.skipIf(os.geteuid() == 0, "root can read any directory")
+    def test_unreadable_directory(self):
+        locked = os.path.join(self.tmpdirpath, "locked")
+        os.mkdir(locked)
+        os.chmod(locked, 0)
+        try:
+            fileset = FilterSet().is_file().resolve(self.tmpdirpath, recursive=False)
+        finally:
+            os.chmod(locked, 0o755)
+
+        self.assertIn(
+            Path(self.tmpdirpath) / "constitution.txt",
+            [item.path for item in fileset.items],
+        )
+
+    def test_count(self):
+        for filterset in [
+            FilterSet(),
+            FilterSet().is_file(),
+            FilterSet().is_dir(),
+            FilterSet().is_file().is_empty(),
+            FilterSet().is_exactly(["constitution.txt", "misc"]),
+        ]:
+            for recursive in [False, True]:
+                self.assertEqual(
+                    filterset.count(self.tmpdirpath, recursive=recursive),
+                    len(filterset.resolve(self.tmpdirpath, recursive=recursive)),
+                )
+
+    def test_threaded(self):
+        for filterset in [
+            FilterSet(),
+            FilterSet().is_file(),
+            FilterSet().is_not_hidden().is_dir(),
+            FilterSet().is_like("*-ch*.txt"),
+        ]:
+            for recursive in [False, True]:
+                expected = filterset.resolve(self.tmpdirpath, recursive=recursive)
+                actual = filterset.resolve(
+                    self.tmpdirpath, recursive=recursive, threads=4
+                )
+                self.assertEqual(
+                    sorted(actual.items, key=lambda item: item.path),
+                    sorted(expected.items, key=lambda item: item.path),
+                )
+
+    def test_roots_only(self):
+        # an included directory containing an excluded directory with an included file, which is a
+        # root when `recursive=False`
+        os.makedirs(os.path.join(self.tmpdirpath, "A", "B"))
+        with open(os.path.join(self.tmpdirpath, "A", "B", "c"), "w"):
+            pass
+
+        for filterset in [
+            FilterSet(),
+            FilterSet().is_dir(),
+            FilterSet().is_not_hidden(),
+            FilterSet().is_like("*-ch*.txt"),
+            FilterSet().matches("^(A|c)$"),
+        ]:
+            for recursive in [False, True]:
+                fileset = filterset.resolve(self.tmpdirpath, recursive=recursive)
+                roots = filterset.resolve(
+                    self.tmpdirpath, recursive=recursive, roots_only=True
+                )
+                self.assertEqual(
+                    sorted(roots, key=str),
+                    sorted(fileset.exclude_children(), key=str),
+                    msg=f"{filterset.get_filters()} with recursive={recursive}",
+                )
+
+        roots = (
+            FilterSet()
+            .matches("^(A|c)$")
+            .resolve(self.tmpdirpath, recursive=False, roots_only=True)
+        )
+        self.assert_file_set_equals(roots, ["A", "A/B/c"])
+
+    def test_narrow(self):
+        base = FilterSet().is_not_hidden()
+        fileset = base.resolve(self.tmpdirpath, recursive=False)
+        for new_filters in [
+            [filters.FilterIsFile()],
+            [filters.FilterIsDirectory(), filters.FilterIsEmpty()],
+            [filters.FilterExclude(Path("pride-and-prejudice"))],
+            [filters.FilterIsInPath(Path("misc"))],
+            [filters.FilterHasExtension("txt"), filters.FilterSizeLess(1)],
+        ]:
+            expected = FilterSet(base.get_filters() + new_filters).resolve(
+                self.tmpdirpath, recursive=False
+            )
+            actual = fileset.narrow(self.tmpdirpath, new_filters)
+            self.assertEqual(
+                sorted(actual.items, key=lambda item: item.path),
+                sorted(expected.items, key=lambda item: item.path),
+            )
+
+    def test_filter_order(self):
+        for _filters in [
+            [filters.FilterSizeLess(1), filters.FilterIsNotHidden()],
+            [
+                filters.FilterHasExtension("txt"),
+                filters.FilterNegated(filters.FilterIsEmpty()),
+                filters.FilterIsNotInPath(Path(self.tmpdirpath) / "misc"),
+            ],
+            [
+                filters.FilterIsFile(),
+                filters.FilterExclude(Path(self.tmpdirpath) / "pride-and-prejudice"),
+                filters.FilterIsLikeName("*.txt"),
+            ],
+        ]:
+            forwards = FilterSet(_filters).resolve(self.tmpdirpath, recursive=False)
+            backwards = FilterSet(_filters[::-1]).resolve(
+                self.tmpdirpath, recursive=False
+            )
+            self.assertEqual(
+                sorted(forwards.items, key=lambda item: item.path),
+                sorted(backwards.items, key=lambda item: item.path),
+            )
@@ -0,0 +1,109 @@
+import os
+import re
+from pathlib import Path
+
+from batchop import filters
+
+from common import BaseTmpDir
+
+
+class TestFilters(BaseTmpDir):
+    def test_test_entry_matches_test(self):
+        root = Path(self.tmpdirpath)
+        to_test = [
+            filters.FilterTrue(),
+            filters.FilterIsDirectory(),
+            filters.FilterIsFile(),
+            filters.FilterIsSpecial(),
+            filters.FilterIsEmpty(),
+            filters.FilterIsExactly([root / "misc"]),
+            filters.FilterIsLikePath("*/misc/*"),
+            filters.FilterIsLikeName("*-ch*.txt"),
+            filters.FilterMatches(re.compile(r"^empty")),
+            filters.FilterIsInPath(root / "pride-and-prejudice"),
+            filters.FilterIsInPath(root / "misc" / "nested"),
+            filters.FilterIsNotInPath(root / "pride-and-prejudice"),
+            filters.FilterIsNotHidden(),
+            filters.FilterSizeGreater(1000),
+            filters.FilterSizeGreaterEqual(0),
+            filters.FilterSizeLess(1000),
+            filters.FilterSizeLessEqual(0),
+            filters.FilterHasExtension("txt"),
+            filters.FilterExclude(root / "misc"),
+            filters.FilterSizeRange(1, 1000),
+            filters.FilterSizeRange(0, None),
+        ]
+        to_test.extend([f.negate() for f in to_test])
+
+        for entry in self._all_entries(self.tmpdirpath):
+            for f in to_test:
+                self.assertEqual(
+                    filters.expand_result(f.test_entry(entry)),
+                    filters.expand_result(f.test(Path(entry.path))),
+                    msg=f"filter {f} on {entry.path}",
+                )
+
+    def test_specialized_negations(self):
+        for f in [
+            filters.FilterIsDirectory(),
+            filters.FilterIsFile(),
+            filters.FilterIsLikePath("*/misc/*"),
+            filters.FilterIsLikeName("*-ch*.txt"),
+            filters.FilterHasExtension("txt"),
+        ]:
+            negated = f.negate()
+            self.assertNotIsInstance(negated, filters.FilterNegated)
+
+            for entry in self._all_entries(self.tmpdirpath):
+                p = Path(entry.path)
+                self.assertEqual(
+                    negated.test(p),
+                    filters.FilterNegated(f).test(p),
+                    msg=f"filter {negated} on {entry.path}",
+                )
+
+    def test_fuse_size_filters(self):
+        is_file = filters.FilterIsFile()
+        self.assertEqual(
+            filters.fuse_size_filters(
+                [
+                    filters.FilterSizeGreater(100),
+                    is_file,
+                    filters.FilterSizeLessEqual(2000),
+                    filters.FilterSizeLess(1000),
+                ]
+            ),
+            [is_file, filters.FilterSizeRange(101, 999)],
+        )
+        self.assertEqual(
+            filters.fuse_size_filters(
+                [filters.FilterSizeGreaterEqual(5), filters.FilterSizeGreater(3)]
+            ),
+            [filters.FilterSizeRange(5, None)],
+        )
+
+        # a single size filter is left alone
+        self.assertEqual(
+            filters.fuse_size_filters([is_file, filters.FilterSizeLess(10)]),
+            [is_file, filters.FilterSizeLess(10)],
+        )
+
+        root = Path(self.tmpdirpath)
+        for entry in self._all_entries(self.tmpdirpath):
+            p = Path(entry.path)
+            for lo, hi in [(0, 0), (1, 2000), (5000, None)]:
+                separate = filters.FilterSizeGreaterEqual(lo).test(p) and (
+                    hi is None or filters.FilterSizeLessEqual(hi).test(p)
+                )
+                self.assertEqual(
+                    filters.FilterSizeRange(lo, hi).test(p),
+                    separate,
+                    msg=f"{lo}-{hi} on {p.relative_to(root)}",
+                )
+
+    def _all_entries(self, directory):
+        with os.scandir(directory) as it:
+            for entry in it:
+                yield entry
+                if entry.is_dir():
+                    yield from self._all_entries(entry.path)
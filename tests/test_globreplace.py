@@ -1,7 +1,7 @@
 import re
 import unittest
 
-from batchop import globreplace
+from batchop import exceptions, globreplace
 
 
 class TestGlobReplace(unittest.TestCase):
@@ -12,6 +12,13 @@ class TestGlobReplace(unittest.TestCase):
         )
         self.assertEqual(globreplace.glob_to_regex("*.*"), r"^(.+?)\.(.+?)$")
 
+    def test_glob_literal_parts(self):
+        self.assertEqual(globreplace.glob_literal_parts("*.md"), [".md"])
+        self.assertEqual(
+            globreplace.glob_literal_parts("B*.* *.md"), ["B", ".", " ", ".md"]
+        )
+        self.assertEqual(globreplace.glob_literal_parts("**"), [])
+
     def test_glob_to_regex_repl(self):
         self.assertEqual(globreplace.glob_to_regex_repl("#1 #2.#3"), r"\1 \2.\3")
 
@@ -20,3 +27,36 @@ class TestGlobReplace(unittest.TestCase):
         repl = globreplace.glob_to_regex_repl("book #1 #3.md")
         r = re.sub(p, repl, "B2024.05 Underworld.md")
         self.assertEqual(r, "book 2024 Underworld.md")
+
+    def test_compile_renamer(self):
+        names = [
+            "a.txt",
+            "notes.txt",
+            ".txt",
+            "IMG_001.jpg",
+            "IMG_.jpg",
+            "B2024.05 Underworld.md",
+            "foo",
+        ]
+        for old, new in [
+            ("notes.txt", "todo.txt"),
+            ("*.txt", "#1.md"),
+            ("IMG_*", "photo_#1"),
+            ("IMG_*.jpg", "#1-img.jpg"),
+            ("B*.* *.md", "book #1 #3.md"),
+            ("*.*", "#2.#1"),
+        ]:
+            rename = globreplace.compile_renamer(old, new)
+            p = re.compile(globreplace.glob_to_regex(old))
+            repl = globreplace.glob_to_regex_repl(new)
+            for name in names:
+                m = p.fullmatch(name)
+                expected = m.expand(repl) if m is not None else None
+                self.assertEqual(rename(name), expected, msg=f"{old} -> {new}: {name}")
+
+    def test_compile_renamer_unknown_group(self):
+        with self.assertRaises(exceptions.UnknownGlobGroup):
+            globreplace.compile_renamer("*.txt", "#2.md")
+
+        with self.assertRaises(exceptions.UnknownGlobGroup):
+            globreplace.compile_renamer("notes.txt", "#1.md")
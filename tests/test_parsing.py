@@ -1,3 +1,4 @@
+import re
 import unittest
 from typing import Any, List, Optional
 
@@ -34,6 +35,34 @@ class TestCommandParsing(unittest.TestCase):
             ),
         )
 
+    def test_list_matches_command(self):
+        cmd = parse_command("list files that matches '^ch[0-9]+'")
+        self.assertEqual(
+            cmd,
+            UnaryCommand(
+                "list",
+                [
+                    filters.FilterIsFile(),
+                    filters.FilterMatches(re.compile("^ch[0-9]+")),
+                ],
+            ),
+        )
+
+    def test_list_command_many_phrases(self):
+        cmd = parse_command("list files that are not empty > 1kb With ext txt")
+        self.assertEqual(
+            cmd,
+            UnaryCommand(
+                "list",
+                [
+                    filters.FilterIsFile(),
+                    filters.FilterNegated(filters.FilterIsEmpty()),
+                    filters.FilterSizeGreater(1000),
+                    filters.FilterHasExtension("txt"),
+                ],
+            ),
+        )
+
     def test_rename_command(self):
         cmd = parse_command("rename '*.md' to '#1.md'")
         self.assertEqual(cmd, RenameCommand("*.md", "#1.md"))
@@ -57,6 +86,17 @@ class TestPatternMatching(unittest.TestCase):
         m = try_phrase_match(pattern, ["are"])
         self.assert_no_match(m)
 
+        m = try_phrase_match(pattern, ["IS"])
+        self.assert_match(m)
+
+    def test_match_case_sensitive(self):
+        pattern = [patterns.AnyLit(["Is", "Are"], case_sensitive=True)]
+        m = try_phrase_match(pattern, ["Are"])
+        self.assert_match(m)
+
+        m = try_phrase_match(pattern, ["are"])
+        self.assert_no_match(m)
+
     def test_match_optional(self):
         pattern = [patterns.Opt(patterns.Lit("an"))]
         m = try_phrase_match(pattern, ["folder"])
@@ -105,6 +145,25 @@ class TestPatternMatching(unittest.TestCase):
         m = try_phrase_match(pattern, ["not", "2.1mb"])
         self.assert_match(m, [2_100_000], negated=True)
 
+    def test_possible_first_tokens(self):
+        self.assertEqual(
+            patterns.possible_first_tokens(
+                [patterns.Opt(patterns.Lit("that")), patterns.AnyLit(["is", "Are"])]
+            ),
+            frozenset(["that", "is", "are"]),
+        )
+        self.assertEqual(
+            patterns.possible_first_tokens(
+                [patterns.Opt(patterns.Lit("is")), patterns.Not(), patterns.Lit("in")]
+            ),
+            frozenset(["is", "not", "in"]),
+        )
+        self.assertIsNone(
+            patterns.possible_first_tokens(
+                [patterns.Opt(patterns.Lit("is")), patterns.SizeUnit()]
+            )
+        )
+
     def assert_match(
         self, m: PhraseMatch, captures: List[Any] = [], negated: bool = False
     ) -> None:
@@ -129,3 +188,8 @@ class TestTokenize(unittest.TestCase):
 
     def test_size_and_unit(self):
         self.assertEqual(tokenize("10kb"), ["10kb"])
+
+    def test_adjacent_and_unterminated_quotes(self):
+        self.assertEqual(tokenize("a'b c'd"), ["a", "b c", "d"])
+        self.assertEqual(tokenize("'' x"), ["", "x"])
+        self.assertEqual(tokenize("named 'To Do"), ["named", "To Do"])